@@ -0,0 +1,230 @@
+"""
+Whole timeline animation bake.
+
+The channels of all enabled shots are evaluated at a fixed frame rate into one float64 matrix of frames x channels.
+The matrix is a memory mapped file in the project's cache directory, next to a json index that describes its layout,
+so recording, scrubbing and external tools can read a frame's uniforms by row instead of evaluating curves.
+
+Every frame remembers a hash of the shot that produced it,
+updating the bake only re-evaluates frames of which the shot changed or of which a different shot became active.
+Updates may be limited to a range of frames, e.g. the frames that are recorded, frames outside of it keep what was baked before.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+from array import array
+from typing import Any, Iterable, Optional, Union
+
+from fileutil import FilePath
+from projutil import currentCacheDirectory
+from shots import Shot
+
+_FORMAT_VERSION = 2
+_FLOAT_SIZE = 8
+
+
+def shotHash(shot: Shot) -> str:
+    """
+    Hash of everything the scene file stores for a shot, which includes everything that affects the values it bakes.
+    Curves that are as they were read from the scene file are hashed by where they were read from, so shots that were not used yet are not read.
+    """
+    hasher = hashlib.sha1()
+    hasher.update(repr((shot.name, str(shot.sceneName), shot.start, shot.end, shot.speed, shot.preroll)).encode('utf8'))
+    sourceKey = shot.sourceKey()
+    if sourceKey is not None:
+        hasher.update(sourceKey.encode('utf8'))
+        return hasher.hexdigest()
+    for name in sorted(shot.curves):
+        hasher.update(name.encode('utf8'))
+        hasher.update(repr(list(shot.curves[name].keyData())).encode('utf8'))
+    return hasher.hexdigest()
+
+
+class AnimationBake:
+    """
+    Frames x channels matrix of all enabled shots at a fixed frame rate.
+
+    Frame N is at beat secondsToBeats(N / fps), channels are all channel names of all enabled shots in sorted order.
+    Like ShotManager.shotAtTime() later shots win when shots overlap, pinning is ignored.
+    Channels that the shot of a frame does not have are NaN, as are frames without a shot.
+    """
+
+    def __init__(self, fps: int, directory: Optional[FilePath] = None) -> None:
+        self.fps = fps
+        directory = directory or currentCacheDirectory()
+        self.__dataPath = directory.join('animation_%d.bin' % fps)
+        self.__indexPath = directory.join('animation_%d.json' % fps)
+        self.bps = 0.0
+        self.channels: list[str] = []
+        self.__channelIndex: dict[str, int] = {}
+        self.frameCount = 0
+        self.__shots: list[Shot] = []
+        self.__hashes: list[str] = []
+        # index into __shots per frame, -1 for frames without a shot
+        self.__owners = array('i')
+        # hash of the shot each frame was baked from, None for frames baked without a shot and '' for frames that were not baked
+        self.__baked: list[Optional[str]] = []
+        self.__file: Optional[Any] = None
+        self.__map: Optional[mmap.mmap] = None
+        self.__matrix: Optional[memoryview] = None
+
+    def close(self) -> None:
+        if self.__matrix is not None:
+            self.__matrix.release()
+            self.__matrix = None
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __beats(self, frame: int, bps: float) -> float:
+        # same math as Timer.secondsToBeats(frame / fps)
+        return frame / float(self.fps) * bps
+
+    def __frameRange(self, start: float, end: float, bps: float) -> tuple[int, int]:
+        """First frame at or after start and first frame at or after end."""
+        result = []
+        for time in (start, end):
+            frame = max(0, int(time / bps * self.fps) - 1)
+            while self.__beats(frame, bps) < time:
+                frame += 1
+            result.append(frame)
+        return result[0], max(result)
+
+    def __readIndex(self) -> Optional[dict[str, Any]]:
+        if not self.__indexPath.exists() or not self.__dataPath.exists():
+            return None
+        try:
+            index = json.loads(self.__indexPath.content())
+        except ValueError:
+            return None
+        if index.get('version') != _FORMAT_VERSION:
+            return None
+        # the data file must be what the index says it is, else nothing in it is of use
+        with self.__dataPath.readBinary() as fh:
+            fh.seek(0, 2)
+            if fh.tell() != index['frames'] * len(index['channels']) * _FLOAT_SIZE:
+                return None
+        return index
+
+    def __mapData(self, size: int) -> None:
+        """Resize the data file to hold size floats and map it, existing rows are kept."""
+        self.close()
+        self.__dataPath.ensureExists()
+        self.__file = open(self.__dataPath, 'r+b')
+        self.__file.truncate(size * _FLOAT_SIZE)
+        if size:
+            self.__map = mmap.mmap(self.__file.fileno(), size * _FLOAT_SIZE)
+            self.__matrix = memoryview(self.__map).cast('d')  # type: ignore
+
+    def update(self, shots: Iterable[Shot], bps: float, start: int = 0, end: Optional[int] = None) -> int:
+        """
+        Bring frames start to end (exclusive, default all frames) up to date with the given shots (in ShotManager order)
+        and tempo in beats per second. Returns the number of frames that had to be evaluated.
+        """
+        shots = [shot for shot in shots if shot.enabled]
+        hashes = [shotHash(shot) for shot in shots]
+        channels = sorted({name for shot in shots for name in shot.channelNames()})
+
+        ranges = [self.__frameRange(shot.start, shot.end, bps) for shot in shots]
+        frameCount = max((shotEnd for _, shotEnd in ranges), default=0)
+        owners = array('i', [-1]) * frameCount
+        for index, (shotStart, shotEnd) in enumerate(ranges):
+            owners[shotStart:shotEnd] = array('i', [index]) * (shotEnd - shotStart)
+
+        # hash of the shot that baked each frame, when the previous bake has the same layout
+        index = self.__readIndex()
+        baked: list[Optional[str]] = [''] * frameCount
+        if index is not None and index['fps'] == self.fps and index['bps'] == bps and index['channels'] == channels:
+            for runStart, runEnd, frameHash in index['runs']:
+                baked[runStart:runEnd] = [frameHash] * (min(runEnd, frameCount) - runStart)
+            baked = baked[:frameCount]
+
+        self.bps = bps
+        self.channels = channels
+        self.__channelIndex = {name: column for column, name in enumerate(channels)}
+        self.frameCount = frameCount
+        self.__shots = shots
+        self.__hashes = hashes
+        self.__owners = owners
+        self.__baked = baked
+        self.__mapData(frameCount * len(channels))
+
+        dirty: dict[int, list[int]] = {}
+        for frame in range(max(0, start), min(frameCount, frameCount if end is None else end)):
+            owner = owners[frame]
+            frameHash = hashes[owner] if owner != -1 else None
+            if baked[frame] != frameHash:
+                dirty.setdefault(owner, []).append(frame)
+                baked[frame] = frameHash
+
+        width = len(channels)
+        matrix = self.__matrix
+        if matrix is not None:
+            empty = array('d', [float('nan')]) * width
+            for owner, frames in dirty.items():
+                for frame in frames:
+                    matrix[frame * width:(frame + 1) * width] = empty
+                if owner == -1:
+                    continue
+                shot = shots[owner]
+                times = [shot.localTime(self.__beats(frame, bps)) for frame in frames]
+                for name, curve in shot.curves.items():
+                    column = self.__channelIndex[name]
+                    for frame, value in zip(frames, curve.evaluateMany(times)):
+                        matrix[frame * width + column] = value
+            assert self.__map is not None
+            self.__map.flush()
+
+        # run length encode what each frame was baked from for the index
+        runs: list[list[Union[int, Optional[str]]]] = []
+        for frame, frameHash in enumerate(baked):
+            if runs and runs[-1][2] == frameHash:
+                runs[-1][1] = frame + 1
+            else:
+                runs.append([frame, frame + 1, frameHash])
+        with self.__indexPath.edit() as fh:
+            json.dump({'version': _FORMAT_VERSION,
+                       'fps': self.fps,
+                       'bps': bps,
+                       'frames': frameCount,
+                       'channels': channels,
+                       'runs': runs,
+                       'shots': [{'hash': digest, 'name': shot.name, 'scene': str(shot.sceneName), 'start': shot.start, 'end': shot.end}
+                                 for shot, digest in zip(shots, hashes)]}, fh, indent=1)
+
+        return sum(len(frames) for frames in dirty.values())
+
+    def shotAtFrame(self, frame: int) -> Optional[Shot]:
+        """The shot of the frame, None if the frame has no shot or was not baked from the shot as it is now."""
+        if not 0 <= frame < self.frameCount:
+            return None
+        owner = self.__owners[frame]
+        if owner == -1 or self.__baked[frame] != self.__hashes[owner]:
+            return None
+        return self.__shots[owner]
+
+    def row(self, frame: int) -> memoryview:
+        """Float64 values of all channels at the given frame, this is a view into the mapped file."""
+        assert 0 <= frame < self.frameCount and self.__matrix is not None
+        width = len(self.channels)
+        return self.__matrix[frame * width:(frame + 1) * width]
+
+    def uniforms(self, frame: int) -> dict[str, Union[float, list[float]]]:
+        """Uniforms of the frame laid out like Shot.evaluate(), empty if the frame has no shot."""
+        shot = self.shotAtFrame(frame)
+        if shot is None or not self.channels:
+            return {}
+        row = self.row(frame)
+        channelIndex = self.__channelIndex
+        uniforms: dict[str, Union[float, list[float]]] = {}
+        for name, (_, size) in shot.evaluationPlan().slots.items():
+            if name in shot.curves:
+                uniforms[name] = row[channelIndex[name]]
+            else:
+                uniforms[name] = [row[channelIndex[name + '.' + channel]] for channel in 'xyzw'[:size]]
+        return uniforms
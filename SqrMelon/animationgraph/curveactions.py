@@ -1,10 +1,20 @@
+from contextlib import ExitStack
 from typing import Any, Callable, Iterable, Optional, Union
 
-from animationgraph.curvedata import Curve, Key
+from animationgraph.curvedata import Curve, Key, KeyRow
+from animationgraph.curvesimplify import reduceKeys
 from mathutil import Vec2
 from qt import *
 
 
+def batchEdit(keys: Iterable[Key]) -> ExitStack:
+    """Curve.batchEdit() for all curves the given keys belong to, so editing many keys sorts each curve only once."""
+    stack = ExitStack()
+    for curve in {key.parentCurve() for key in keys}:
+        stack.enter_context(curve.batchEdit())
+    return stack
+
+
 class RemappedEvent:
     """Utility to store event data in camera-space instead of pixel-space"""
 
@@ -79,23 +89,21 @@ class DragAction(QUndoCommand):
 
     def _restore(self) -> None:
         """Revert key state."""
-        i = 0
-        for key in self.__selection:
-            key.setPoint(self.__restoreData[i])
-            i += 1
+        with batchEdit(self.__selection):
+            for i, key in enumerate(self.__selection):
+                key.setPoint(self.__restoreData[i])
 
     def _apply(self) -> None:
         """Set key state."""
-        i = 0
-        for key in self.__selection:
-            x = self.__restoreData[i][0] + self.__delta[0]
-            y = self.__restoreData[i][1] + self.__delta[1]
-            if self.__snap[0]:
-                x = round(x * self.__snap[0]) / self.__snap[0]
-            if self.__snap[1]:
-                y = round(y * self.__snap[1]) / self.__snap[1]
-            key.setPoint(Vec2(x, y))
-            i += 1
+        with batchEdit(self.__selection):
+            for i, key in enumerate(self.__selection):
+                x = self.__restoreData[i][0] + self.__delta[0]
+                y = self.__restoreData[i][1] + self.__delta[1]
+                if self.__snap[0]:
+                    x = round(x * self.__snap[0]) / self.__snap[0]
+                if self.__snap[1]:
+                    y = round(y * self.__snap[1]) / self.__snap[1]
+                key.setPoint(Vec2(x, y))
 
     def update(self, event: RemappedEvent) -> bool:
         """Handle mouse move.
@@ -139,12 +147,14 @@ class DeleteAction(QUndoCommand):
         self.__selectionPerChannel = selectionPerChannel
 
     def redo(self) -> None:
-        for key in self.__selectionPerChannel:
-            key.delete()
+        with batchEdit(self.__selectionPerChannel):
+            for key in self.__selectionPerChannel:
+                key.delete()
 
     def undo(self) -> None:
-        for key in self.__selectionPerChannel:
-            key.reInsert()
+        with batchEdit(self.__selectionPerChannel):
+            for key in self.__selectionPerChannel:
+                key.reInsert()
 
 
 class InsertKeyAction(QUndoCommand):
@@ -207,6 +217,50 @@ class SetKeyAction(QUndoCommand):
             key.delete()
 
 
+class SimplifyAction(QUndoCommand):
+    """Remove keys from the given curves while they stay within a tolerance of the original, see curvesimplify."""
+
+    def __init__(self, curves: Iterable[Curve], tolerance: float) -> None:
+        super(SimplifyAction, self).__init__('SimplifyCurves')
+        self.__removed: list[Key] = []
+        # kept keys with their row before and after simplifying
+        self.__kept: list[tuple[Key, KeyRow, KeyRow]] = []
+        for curve in curves:
+            for key, row, reduced in zip(curve, curve.keyData(), reduceKeys(curve, tolerance)):
+                if reduced is None:
+                    self.__removed.append(key)
+                elif reduced != row:
+                    self.__kept.append((key, row, reduced))
+
+    def isEmpty(self) -> bool:
+        return not self.__removed
+
+    def removedCount(self) -> int:
+        return len(self.__removed)
+
+    @staticmethod
+    def __setRow(key: Key, row: KeyRow) -> None:
+        inTangentX, inTangentY, _, _, outTangentX, outTangentY, tangentBroken, tangentMode = row
+        key.setTangentModeSilent(tangentMode)
+        key.tangentBroken = bool(tangentBroken)
+        key.setInTangent(Vec2(inTangentX, inTangentY))
+        key.setOutTangent(Vec2(outTangentX, outTangentY))
+
+    def redo(self) -> None:
+        with batchEdit(self.__removed):
+            for key in self.__removed:
+                key.delete()
+            for key, _, reduced in self.__kept:
+                self.__setRow(key, reduced)
+
+    def undo(self) -> None:
+        with batchEdit(self.__removed):
+            for key in self.__removed:
+                key.reInsert()
+            for key, row, _ in self.__kept:
+                self.__setRow(key, row)
+
+
 class EditKeyAction(QUndoCommand):
     """
     Single action supporting multiple different "setter" actions on the key data.
@@ -272,9 +326,11 @@ class EditKeyAction(QUndoCommand):
             key.setValue(value)
 
     def redo(self) -> None:
-        for i, key in enumerate(self.__keys):
-            self.__set(key, self.__newValues[i])
+        with batchEdit(self.__keys):
+            for i, key in enumerate(self.__keys):
+                self.__set(key, self.__newValues[i])
 
     def undo(self) -> None:
-        for i, key in enumerate(self.__keys):
-            self.__set(key, self.__oldValues[i])
+        with batchEdit(self.__keys):
+            for i, key in enumerate(self.__keys):
+                self.__set(key, self.__oldValues[i])
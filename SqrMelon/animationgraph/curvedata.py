@@ -1,150 +1,384 @@
 from __future__ import annotations
 
-from functools import lru_cache
-from typing import Iterator, NamedTuple, Optional, List, Union
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from math import ceil, sqrt
+from typing import Any, Iterable, Iterator, NamedTuple, Optional, List, Sequence, Union
 
 from mathutil import Vec2
 
+try:
+    import numpy
+except ImportError:
+    # numpy is an optional dependency (see setup.py extras), without it batch evaluation falls back to python
+    numpy = None  # type: ignore
+
+# Key data is stored column wise, these are the column indices.
+_TIME, _VALUE, _IN_X, _IN_Y, _OUT_X, _OUT_Y, _BROKEN, _MODE = range(8)
+
+# How many keys CurveCursor walks from its previous position before falling back to a binary search.
+_CURSOR_STEPS = 4
+
+# Upper bound of lookup table samples per segment, so extreme tangents can not explode the table size.
+_MAX_SEGMENT_SAMPLES = 4096
+
+# A single row of key data in column order.
+KeyRow = tuple[float, float, float, float, float, float, int, int]
+
+
+def _newColumns() -> list[array]:
+    return [array('d'), array('d'), array('d'), array('d'), array('d'), array('d'), array('b'), array('b')]
+
+
+def _row(columns: list[array], index: int) -> KeyRow:
+    return tuple(column[index] for column in columns)  # type: ignore
+
 
 class Key:
     """A single key in a curve.
 
+    Keys are light views into the key arrays of their curve, so they only know their curve and their index in it.
+    A key that is not in its curve (because it is new or got deleted) holds its data in arrays of its own.
+
     Currently tangent X values, tangentBorken and the TANGENT_USER mode are unused.
     """
     # TODO: Use enums
     TYPE_MANUAL, TYPE_LINEAR, TYPE_FLAT = range(3)
     TANGENT_AUTO, TANGENT_SPLINE, TANGENT_LINEAR, TANGENT_FLAT, TANGENT_STEPPED, TANGENT_USER = range(6)
 
+    __slots__ = ('_curve', '_columns', '_index')
+
     def __init__(self, time: float, value: float, parent: Curve) -> None:
-        self.__point = Vec2(time, value)
-        self.__parent = parent
+        self._curve = parent
         # note that tangent X values have been deprecated and is not exported;
         #   they were for cubic bezier curves that never got made
-        self.__inTangent = Vec2(0.0, 0.0)
-        self.__outTangent = Vec2(0.0, 0.0)
-        self.__inTangentType = Key.TYPE_LINEAR
-        self.__outTangentType = Key.TYPE_LINEAR
-        self.__tangentBroken = False
-        self.__tangentMode = Key.TANGENT_AUTO
+        self._detach((time, value, 0.0, 0.0, 0.0, 0.0, False, Key.TANGENT_AUTO))
+
+    def _attach(self, columns: list[array], index: int) -> None:
+        self._columns = columns
+        self._index = index
+
+    def _detach(self, row: KeyRow) -> None:
+        self._columns = _newColumns()
+        self._index = 0
+        for column, value in zip(self._columns, row):
+            column.append(value)
+
+    def _row(self) -> KeyRow:
+        return _row(self._columns, self._index)
 
     def clone(self, parent: Curve) -> Key:
         key = self.__class__(self.time(), self.value(), parent)
-        key.__inTangent = Vec2(self.__inTangent)
-        key.__outTangent = Vec2(self.__outTangent)
-        key.__tangentBroken = self.tangentBroken
-        key.__tangentMode = self.tangentMode
+        key._detach(self._row())
         return key
 
     @property
     def tangentBroken(self) -> bool:
-        return self.__tangentBroken
+        return bool(self._columns[_BROKEN][self._index])
 
     @tangentBroken.setter
     def tangentBroken(self, tangentBroken: bool) -> None:
-        self.__tangentBroken = tangentBroken
+        self._columns[_BROKEN][self._index] = tangentBroken
         self.updateTangents()
 
     @property
     def tangentMode(self) -> int:
-        return self.__tangentMode
+        return self._columns[_MODE][self._index]
 
     @tangentMode.setter
     def tangentMode(self, tangentMode: int) -> None:
-        self.__tangentMode = tangentMode
+        self._columns[_MODE][self._index] = tangentMode
         self.updateTangents()
 
     def setTangentModeSilent(self, tangentMode: int) -> None:
-        self.__tangentMode = tangentMode
+        self._columns[_MODE][self._index] = tangentMode
+        self._curve.invalidate()
 
     def inTangent(self) -> Vec2:
-        return Vec2(self.__inTangent)
+        return Vec2(self._columns[_IN_X][self._index], self._columns[_IN_Y][self._index])
 
     def setInTangent(self, value: Vec2) -> None:
-        self.__inTangent = Vec2(value)
+        self._columns[_IN_X][self._index] = value.x
+        self._columns[_IN_Y][self._index] = value.y
+        self._curve.invalidate()
 
     def outTangent(self) -> Vec2:
-        return Vec2(self.__outTangent)
+        return Vec2(self._columns[_OUT_X][self._index], self._columns[_OUT_Y][self._index])
 
     def setOutTangent(self, value: Vec2) -> None:
-        self.__outTangent = Vec2(value)
+        self._columns[_OUT_X][self._index] = value.x
+        self._columns[_OUT_Y][self._index] = value.y
+        self._curve.invalidate()
 
     def updateTangents(self) -> None:
-        if self.__tangentMode == Key.TANGENT_USER:
+        tangentMode = self.tangentMode
+        if tangentMode == Key.TANGENT_USER:
             return
-        if self.__tangentMode == Key.TANGENT_STEPPED:
+        if tangentMode == Key.TANGENT_STEPPED:
             # this leaves the input tangent as is, so you can go set e.g.
             #   "linear" to get the input, then back to "stepped"
             # TODO: have "output is stepped" as separate state ("in tangent" with "stepped output" control is tedious)
             self.setOutTangent(Vec2(0.0, float('inf')))
             return
-        if self.__tangentMode == Key.TANGENT_FLAT:
+        if tangentMode == Key.TANGENT_FLAT:
             self.setInTangent(Vec2(0.0, 0.0))
             self.setOutTangent(Vec2(0.0, 0.0))
         else:
-            self.__parent.updateTangents(self, self.__tangentMode)
+            self._curve.updateTangents(self, tangentMode)
 
     def time(self) -> float:
-        return self.__point.x
+        return self._columns[_TIME][self._index]
 
     def setTime(self, time: float) -> None:
-        self.__point.x = time
-        self.__parent.sortKeys()
+        self._columns[_TIME][self._index] = time
+        self._curve.keyMoved(self)
 
     def value(self) -> float:
-        return self.__point.y
+        return self._columns[_VALUE][self._index]
 
     def setValue(self, value: float) -> None:
-        self.__point.y = value
-        self.__parent.keyChanged(self)
+        self._columns[_VALUE][self._index] = value
+        self._curve.keyChanged(self)
 
     def point(self) -> Vec2:
         """Retruns by copy."""
-        return Vec2(self.__point)
+        return Vec2(self.time(), self.value())
 
     def setPoint(self, point: Vec2) -> None:
-        self.__point = Vec2(point)
-        self.__parent.sortKeys()
-        self.__parent.keyChanged(self)
+        self._columns[_TIME][self._index] = point.x
+        self._columns[_VALUE][self._index] = point.y
+        self._curve.keyMoved(self)
 
     def delete(self) -> None:
-        self.__parent.deleteKey(self)
+        self._curve.deleteKey(self)
 
     def reInsert(self) -> None:
-        self.__parent.reInsert(self)
+        self._curve.reInsert(self)
 
     def parentCurve(self) -> Curve:
-        return self.__parent
+        return self._curve
+
+
+class CurveCursor:
+    """
+    Evaluates a curve at times close to the previous evaluation, such as during playback,
+    by remembering the segment of the previous call. Finding the next segment then takes a few steps at most,
+    discontinuous jumps (scrubbing, looping) fall back to a binary search.
+    """
+    __slots__ = ('curve', '_segment')
+
+    def __init__(self, curve: Curve) -> None:
+        self.curve = curve
+        self._segment = 0
+
+    def evaluate(self, time: float, lutTolerance: float = 0.0) -> float:
+        y, self._segment = self.curve._evaluateNear(time, self._segment, lutTolerance)
+        return y
 
 
 class Curve:
-    """Animation data with Cubic Hermite Spline interpolation."""
+    """Animation data with Cubic Hermite Spline interpolation.
+
+    Keys are stored in parallel arrays (see _TIME and friends), Key objects are only created when they are asked for.
+    """
 
     def __init__(self) -> None:
-        self.__keys: list[Key] = []
+        # the key arrays are only ever modified in place, because Key views hold on to this list
+        self._columns = _newColumns()
+        # Key views by index, None where nobody asked for that key yet.
+        self.__keys: list[Optional[Key]] = []
+        # Sorted key times, key values and per segment (lhsTime, dx, c0, c1, c2, c3),
+        # rebuilt lazily by __segmentTable() after any key edit.
+        self.__segments: Optional[tuple[list[float], list[float], list[tuple[float, float, float, float, float, float]]]] = None
+        # The same table as numpy arrays (times, values, segments as an (n - 1) x 6 matrix) for evaluateMany().
+        self.__segmentArrays: Optional[tuple[Any, Any, Any]] = None
+        # Lookup table for evaluateSampled() as (tolerance, per segment sample offset, per segment sample count, samples).
+        self.__sampleTable: Optional[tuple[float, list[int], list[int], array]] = None
+        # Nesting depth of batchEdit() and whether keys were edited during it.
+        self.__batchDepth = 0
+        self.__batchDirty = False
+        # Counts key edits, so owners can tell whether the curve changed since they last looked.
+        self.version = 0
         # TODO: Why sort empty list?
         self.sortKeys()
 
     def clone(self) -> Curve:
         curve = Curve()
-        for key in self.__keys:
-            k = key.clone(curve)
-            curve.__keys.append(k)
+        for index, column in enumerate(self._columns):
+            curve._columns[index] = array(column.typecode, column)
+        curve.__keys = [None] * len(self.__keys)
         curve.sortKeys()
         return curve
 
+    def __key(self, index: int) -> Key:
+        key = self.__keys[index]
+        if key is None:
+            key = Key.__new__(Key)
+            key._curve = self
+            key._attach(self._columns, index)
+            self.__keys[index] = key
+        return key
+
+    def __indexOf(self, key: Key) -> int:
+        if key._columns is not self._columns:
+            raise ValueError('Key is not in this curve.')
+        return key._index
+
+    def __reindex(self, start: int = 0) -> None:
+        for index in range(start, len(self.__keys)):
+            key = self.__keys[index]
+            if key is not None:
+                key._index = index
+
     def keyAt(self, time: float) -> Optional[Key]:
-        for key in self.__keys:
-            if key.time() == time:
-                return key
+        for index, keyTime in enumerate(self._columns[_TIME]):
+            if keyTime == time:
+                return self.__key(index)
         return None
 
+    def keyTimes(self) -> Sequence[float]:
+        """Sorted key times, by reference so do not modify."""
+        return self._columns[_TIME]
+
+    def keyData(self) -> Iterator[KeyRow]:
+        """Iterate all keys as (inTangentX, inTangentY, time, value, outTangentX, outTangentY, tangentBroken, tangentMode),
+        the argument order of addKeyWithTangents(), without creating Key objects."""
+        columns = self._columns
+        return zip(columns[_IN_X], columns[_IN_Y], columns[_TIME], columns[_VALUE], columns[_OUT_X], columns[_OUT_Y], columns[_BROKEN], columns[_MODE])
+
+    def keyColumns(self) -> list[array]:
+        """Copies of the key data columns: time, value, inTangentX, inTangentY, outTangentX, outTangentY, tangentBroken, tangentMode."""
+        return [array(column.typecode, column) for column in self._columns]
+
+    def restoreKeyColumns(self, columns: list[array]) -> None:
+        """Replace all keys by columns as returned by keyColumns(), these are taken as is and owned by the curve from now on."""
+        assert len(columns) == 8 and len({len(column) for column in columns}) == 1
+        self.__clearKeys()
+        self._columns[:] = columns
+        self.__keys = [None] * len(columns[_TIME])
+        self.invalidate()
+
+    def setKeyData(self, keys: Iterable[KeyRow]) -> None:
+        """Replace all keys in bulk, each key is given as in keyData().
+
+        Tangents are kept as given, except where the key's tangent mode derives them.
+        """
+        self.__setKeyData(keys, False)
+
+    def loadKeyData(self, keys: Iterable[KeyRow]) -> None:
+        """setKeyData() for keys read from a scene file.
+
+        Gives the same result as calling addKeyWithTangents() for each key, but only sorts and updates tangents once.
+        """
+        self.__setKeyData(keys, True)
+
+    def loadKeyColumns(self, data: Sequence[float]) -> None:
+        """loadKeyData() for keys given as one flat sequence of 8 values per key in keyData() order, as scene files store them.
+
+        Keys in time order, as scene files save them, are copied column by column (with numpy when available)
+        instead of key by key. Other data falls back to loadKeyData().
+        """
+        count = len(data) // 8
+        assert count * 8 == len(data), 'Key data must have 8 values per key, got %d values' % len(data)
+        if numpy is not None:
+            table = numpy.array(data, dtype=numpy.float64).reshape(count, 8)
+            if not numpy.all(table[1:, 2] >= table[:-1, 2]):
+                self.loadKeyData((inX, inY, time, value, outX, outY, int(broken), int(mode)) for inX, inY, time, value, outX, outY, broken, mode in table.tolist())
+                return
+            # loadKeyData() inserts keys in order, so every stepped key but the first gets automatic tangents as the last key: flat
+            stepped = table[:, 7] == Key.TANGENT_STEPPED
+            stepped[:1] = False
+            table[stepped, 0:2] = 0.0
+            columns = [array('d', table[:, 2].tobytes()), array('d', table[:, 3].tobytes()),
+                       array('d', table[:, 0].tobytes()), array('d', table[:, 1].tobytes()),
+                       array('d', table[:, 4].tobytes()), array('d', table[:, 5].tobytes()),
+                       array('b', table[:, 6].astype(numpy.int8).tobytes()), array('b', table[:, 7].astype(numpy.int8).tobytes())]
+        else:
+            times = data[2::8]
+            if any(times[i] > times[i + 1] for i in range(len(times) - 1)):
+                self.loadKeyData((data[i], data[i + 1], data[i + 2], data[i + 3], data[i + 4], data[i + 5], int(data[i + 6]), int(data[i + 7])) for i in range(0, len(data), 8))
+                return
+            columns = [array('d', data[2::8]), array('d', data[3::8]),
+                       array('d', data[0::8]), array('d', data[1::8]),
+                       array('d', data[4::8]), array('d', data[5::8]),
+                       array('b', (int(x) for x in data[6::8])), array('b', (int(x) for x in data[7::8]))]
+            for index in range(1, count):
+                if columns[_MODE][index] == Key.TANGENT_STEPPED:
+                    columns[_IN_X][index] = columns[_IN_Y][index] = 0.0
+        self.__clearKeys()
+        self._columns[:] = columns
+        self.__keys = [None] * count
+        self.sortKeys()
+
+    def __clearKeys(self) -> None:
+        """Remove all keys, existing Key objects keep their data."""
+        for index, key in enumerate(self.__keys):
+            if key is not None:
+                key._detach(_row(self._columns, index))
+        for column in self._columns:
+            del column[:]
+        self.__keys = []
+
+    def __setKeyData(self, keys: Iterable[KeyRow], asAdded: bool) -> None:
+        self.__clearKeys()
+        columns = self._columns
+        for inTangentX, inTangentY, time, value, outTangentX, outTangentY, tangentBroken, tangentMode in keys:
+            index = bisect_right(columns[_TIME], time)
+            row = (time, value, inTangentX, inTangentY, outTangentX, outTangentY, tangentBroken, tangentMode)
+            for column, data in zip(columns, row):
+                column.insert(index, data)
+            self.__keys.append(None)
+            # addKeyWithTangents() runs the default TANGENT_AUTO update when setting tangentBroken, which is
+            # only undone later by the key's own mode when that mode recomputes the tangents
+            if asAdded and tangentMode == Key.TANGENT_STEPPED:
+                self.__computeTangents(index, Key.TANGENT_AUTO)
+        self.sortKeys()
+
+    @contextmanager
+    def batchEdit(self) -> Iterator[None]:
+        """Defer sorting and tangent updates of key edits until the outermost batchEdit() exits.
+
+        Editing n keys then costs one sort instead of n. Keys may be out of order until the batch ends,
+        so don't evaluate the curve or rely on key indices inside it.
+        """
+        self.__batchDepth += 1
+        try:
+            yield
+        finally:
+            self.__batchDepth -= 1
+            if not self.__batchDepth and self.__batchDirty:
+                self.__batchDirty = False
+                self.sortKeys()
+
+    def __deferred(self) -> bool:
+        """Returns True and remembers there is work to do when inside batchEdit()."""
+        self.invalidate()
+        if self.__batchDepth:
+            self.__batchDirty = True
+            return True
+        return False
+
+    def __updateTangentsAround(self, indices: Iterable[int]) -> None:
+        """Update tangents of the given keys and their direct neighbours, the only ones that depend on a key's point."""
+        count = len(self.__keys)
+        for index in sorted({neighbour for index in indices for neighbour in (index - 1, index, index + 1) if 0 <= neighbour < count}):
+            self.__updateTangentsAt(index)
+
     def deleteKey(self, key: Key) -> None:
-        idx = self.__keys.index(key)
+        idx = self.__indexOf(key)
+        key._detach(_row(self._columns, idx))
+        for column in self._columns:
+            column.pop(idx)
         self.__keys.pop(idx)
-        if idx != 1 and len(self.__keys):
-            self.__keys[idx - 1].updateTangents()
+        self.__reindex(idx)
+        if self.__deferred():
+            return
+        # the keys before and after the deleted key are now neighbours
+        if idx > 0:
+            self.__updateTangentsAt(idx - 1)
         if idx != len(self.__keys):
-            self.__keys[idx].updateTangents()
+            self.__updateTangentsAt(idx)
 
     def addKeyWithTangents(self,
                            inTangentX: float, inTangentY: float,
@@ -152,88 +386,154 @@ class Curve:
                            outTangentX: float, outTangentY: float,
                            tangentBroken: bool, tangentMode: int) -> Key:
         key = Key(time, value, self)
-        self.__keys.append(key)
-        self.sortKeys()
+        self.reInsert(key)
         key.setInTangent(Vec2(inTangentX, inTangentY))
         key.setOutTangent(Vec2(outTangentX, outTangentY))
         key.tangentBroken = tangentBroken
         key.tangentMode = tangentMode
+        if tangentMode == Key.TANGENT_USER:
+            # setting tangentBroken updated the tangents in the default mode, user tangents must stay as given
+            key.setInTangent(Vec2(inTangentX, inTangentY))
+            key.setOutTangent(Vec2(outTangentX, outTangentY))
         return key
 
     def reInsert(self, key: Key) -> None:
-        self.__keys.append(key)
-        self.sortKeys()
+        row = key._row()
+        # after any keys at the same time, as if appended and sorted
+        idx = bisect_right(self._columns[_TIME], row[_TIME])
+        for column, value in zip(self._columns, row):
+            column.insert(idx, value)
+        key._attach(self._columns, idx)
+        self.__keys.insert(idx, key)
+        self.__reindex(idx + 1)
+        if self.__deferred():
+            return
+        self.__updateTangentsAround((idx,))
 
     def keyChanged(self, key: Key) -> None:
-        idx = self.__keys.index(key)
-        first = idx == 0
-        last = idx == len(self.__keys) - 1
+        idx = self.__indexOf(key)
+        if self.__deferred():
+            return
+        self.__updateTangentsAround((idx,))
 
-        if not first:
-            self.__keys[idx - 1].updateTangents()
-        key.updateTangents()
-        if not last:
-            self.__keys[idx + 1].updateTangents()
+    def keyMoved(self, key: Key) -> None:
+        """Move a key of which the time changed to its sorted position and update the tangents affected by it."""
+        if key._columns is not self._columns:
+            # detached keys get sorted when they are reinserted
+            return
+        if self.__deferred():
+            return
+        idx = key._index
+        times = self._columns[_TIME]
+        time = times[idx]
+        if (idx == 0 or times[idx - 1] <= time) and (idx == len(times) - 1 or time <= times[idx + 1]):
+            self.__updateTangentsAround((idx,))
+            return
+
+        row = _row(self._columns, idx)
+        for column in self._columns:
+            column.pop(idx)
+        self.__keys.pop(idx)
+        # like a stable sort, keys at the same time keep their order
+        newIdx = min(max(idx, bisect_left(times, time)), bisect_right(times, time))
+        for column, value in zip(self._columns, row):
+            column.insert(newIdx, value)
+        self.__keys.insert(newIdx, key)
+        self.__reindex(min(idx, newIdx))
+        # the old neighbours are now next to each other
+        self.__updateTangentsAround((newIdx, idx - 1 if newIdx > idx else idx + 1))
+
+    def __updateTangentsAt(self, idx: int) -> None:
+        """Key.updateTangents() for the key at the given index."""
+        columns = self._columns
+        tangentMode = columns[_MODE][idx]
+        if tangentMode == Key.TANGENT_USER:
+            return
+        self.invalidate()
+        if tangentMode == Key.TANGENT_STEPPED:
+            # this leaves the input tangent as is, see Key.updateTangents()
+            columns[_OUT_X][idx] = 0.0
+            columns[_OUT_Y][idx] = float('inf')
+            return
+        if tangentMode == Key.TANGENT_FLAT:
+            columns[_IN_X][idx] = columns[_IN_Y][idx] = 0.0
+            columns[_OUT_X][idx] = columns[_OUT_Y][idx] = 0.0
+        else:
+            self.__computeTangents(idx, tangentMode)
 
     def updateTangents(self, key: Key, mode: int) -> None:
-        idx = self.__keys.index(key)
+        idx = self.__indexOf(key)
+        if self.__deferred():
+            return
+        self.__computeTangents(idx, mode)
+
+    def __computeTangents(self, idx: int, mode: int) -> None:
+        times, values, inX, inY, outX, outY = self._columns[:6]
         first = idx == 0
-        last = idx == len(self.__keys) - 1
+        last = idx == len(times) - 1
 
         if first and last:
             return
 
-        def keyDirection(a: Key, b: Key) -> Vec2:
-            keyDifference = b.point() - a.point()
+        self.invalidate()
+
+        def keyDirection(a: int, b: int) -> tuple[float, float]:
+            x = times[b] - times[a]
+            y = values[b] - values[a]
+            length = (x * x + y * y) ** 0.5
             try:
-                keyDifference.normalize()
+                x /= length
+                y /= length
             except ZeroDivisionError:
-                return Vec2(0.0, 0.0)
-            keyDifference.x = abs(keyDifference.x)
-            return keyDifference
+                return 0.0, 0.0
+            return abs(x), y
 
         def finalize() -> None:
-            if not first and key.inTangent().length() != 0:
-                pd = self.__keys[idx].time() - self.__keys[idx - 1].time()
+            x = inX[idx]
+            y = inY[idx]
+            if not first and (x * x + y * y) ** 0.5 != 0:
+                pd = times[idx] - times[idx - 1]
                 try:
-                    key.setInTangent(key.inTangent() * pd / key.inTangent().x)
+                    inX[idx], inY[idx] = x * pd / x, y * pd / x
                 except ZeroDivisionError:
                     pass
-            if not last and key.outTangent().length() != 0:
-                nd = self.__keys[idx + 1].time() - self.__keys[idx].time()
+            x = outX[idx]
+            y = outY[idx]
+            if not last and (x * x + y * y) ** 0.5 != 0:
+                nd = times[idx + 1] - times[idx]
                 try:
-                    key.setOutTangent(key.outTangent() * nd / key.outTangent().x)
+                    outX[idx], outY[idx] = x * nd / x, y * nd / x
                 except ZeroDivisionError:
                     pass
 
         if mode == Key.TANGENT_LINEAR:
             if first:
-                key.setInTangent(Vec2(0.0, 0.0))
+                inX[idx], inY[idx] = 0.0, 0.0
             else:
-                t = keyDirection(self.__keys[idx], self.__keys[idx - 1])
-                t.x = -t.x
-                key.setInTangent(t)
+                x, y = keyDirection(idx, idx - 1)
+                inX[idx], inY[idx] = -x, y
 
             if last:
-                key.setOutTangent(Vec2(0.0, 0.0))
+                outX[idx], outY[idx] = 0.0, 0.0
             else:
-                key.setOutTangent(keyDirection(self.__keys[idx], self.__keys[idx + 1]))
+                outX[idx], outY[idx] = keyDirection(idx, idx + 1)
 
             finalize()
             return
 
         elif mode == Key.TANGENT_SPLINE:
             if first:
-                key.setOutTangent(keyDirection(self.__keys[idx], self.__keys[idx + 1]))
-                key.setInTangent(-key.outTangent())  # TODO: I flipped the sign, check if that was the right thing to do
+                x, y = keyDirection(idx, idx + 1)
+                outX[idx], outY[idx] = x, y
+                inX[idx], inY[idx] = -x, -y  # TODO: I flipped the sign, check if that was the right thing to do
             elif last:
-                t = keyDirection(self.__keys[idx], self.__keys[idx - 1])
-                t.x = -t.x
-                key.setInTangent(t)
-                key.setOutTangent(-key.inTangent())
+                x, y = keyDirection(idx, idx - 1)
+                inX[idx], inY[idx] = -x, y
+                outX[idx], outY[idx] = x, -y
             else:
-                key.setOutTangent(keyDirection(self.__keys[idx - 1], self.__keys[idx + 1]))
-                key.setInTangent(-key.outTangent())
+                x, y = keyDirection(idx - 1, idx + 1)
+                outX[idx], outY[idx] = x, y
+                inX[idx], inY[idx] = -x, -y
 
             finalize()
             return
@@ -242,13 +542,13 @@ class Curve:
             def sgn(x: float) -> float:
                 return -1.0 if x < 1.0 else 1.0 if x > 1.0 else 0.0
 
-            if first or last or sgn(self.__keys[idx - 1].value() - key.value()) == sgn(
-                    self.__keys[idx + 1].value() - key.value()):
-                key.setInTangent(Vec2(0.0, 0.0))
-                key.setOutTangent(Vec2(0.0, 0.0))
+            if first or last or sgn(values[idx - 1] - values[idx]) == sgn(values[idx + 1] - values[idx]):
+                inX[idx], inY[idx] = 0.0, 0.0
+                outX[idx], outY[idx] = 0.0, 0.0
             else:
-                key.setOutTangent(keyDirection(self.__keys[idx - 1], self.__keys[idx + 1]))
-                key.setInTangent(-key.outTangent())
+                x, y = keyDirection(idx - 1, idx + 1)
+                outX[idx], outY[idx] = x, y
+                inX[idx], inY[idx] = -x, -y
 
             finalize()
             return
@@ -258,68 +558,208 @@ class Curve:
 
         assert False, 'Invalid tangent mode for key.'
 
+    def invalidate(self) -> None:
+        """Discard the cached segment table, called whenever key data changes."""
+        self.version += 1
+        self.__segments = None
+        self.__segmentArrays = None
+        self.__sampleTable = None
+
     def sortKeys(self) -> None:
-        # TODO: optimize in any way?
-        self.__keys.sort(key=lambda k: k.time())
-        for key in self.__keys:
-            key.updateTangents()
+        if self.__deferred():
+            return
+        times = self._columns[_TIME]
+        order = sorted(range(len(times)), key=times.__getitem__)
+        if any(index != sortedIndex for index, sortedIndex in enumerate(order)):
+            for index, column in enumerate(self._columns):
+                self._columns[index] = array(column.typecode, [column[i] for i in order])
+            self.__keys = [self.__keys[i] for i in order]
+            self.__reindex()
+        for index in range(len(self.__keys)):
+            self.__updateTangentsAt(index)
 
     def __iter__(self) -> Iterator[Key]:
-        for key in self.__keys:
-            yield key
+        for index in range(len(self.__keys)):
+            yield self.__key(index)
 
     def __getitem__(self, index: int) -> Key:
-        return self.__keys[index]
+        if index < 0:
+            index += len(self.__keys)
+        if not 0 <= index < len(self.__keys):
+            raise IndexError('Key index out of range.')
+        return self.__key(index)
 
     def __setitem__(self, index: int, key: Key) -> None:
+        if index < 0:
+            index += len(self.__keys)
+        row = key._row()
+        previous = self.__keys[index]
+        if previous is not None:
+            previous._detach(_row(self._columns, index))
+        for column, value in zip(self._columns, row):
+            column[index] = value
+        key._curve = self
+        key._attach(self._columns, index)
         self.__keys[index] = key
+        self.invalidate()
 
     def __len__(self) -> int:
         return len(self.__keys)
 
     def scale(self, speed: float) -> None:
         """Speed up the animation by the given multiplier."""
-        # reverse to avoid auto-sorting messing up anything
-        for key in reversed(self.__keys):
-            key.setTime(key.time() / speed)
+        times = self._columns[_TIME]
+        for index in range(len(times)):
+            times[index] /= speed
+        self.sortKeys()
 
     def move(self, deltaTime: float) -> None:
         """Move the animation by the given addition."""
-        # shifting to the right, reverse application order to avoid auto-sorting messing up anything
-        if deltaTime > 0.0:
-            for key in reversed(self.__keys):
-                key.setTime(key.time() + deltaTime)
-        else:
-            for key in self.__keys:
-                key.setTime(key.time() + deltaTime)
+        times = self._columns[_TIME]
+        for index in range(len(times)):
+            times[index] += deltaTime
+        self.sortKeys()
 
     def trim(self, start: float, end: float) -> None:
         """Delete keys outside of the given time range."""
         assert start <= end
         startIdx = -1
         endIdx = len(self.__keys)
-        for i, key in enumerate(self.__keys):
-            if startIdx < 0 and key.time() > start:
+        for i, time in enumerate(self._columns[_TIME]):
+            if startIdx < 0 and time > start:
                 startIdx = i - 1
-            if key.time() >= end:
+            if time >= end:
                 endIdx = i + 1
                 break
-        self.__keys = self.__keys[max(startIdx, 0):min(endIdx, len(self.__keys))]
+        startIdx = max(startIdx, 0)
+        endIdx = min(endIdx, len(self.__keys))
+        for index, key in enumerate(self.__keys):
+            if key is not None and not startIdx <= index < endIdx:
+                key._detach(_row(self._columns, index))
+        for index, column in enumerate(self._columns):
+            self._columns[index] = column[startIdx:endIdx]
+        self.__keys = self.__keys[startIdx:endIdx]
+        self.__reindex()
+        if self.__deferred() or not self.__keys:
+            return
+        # the first and last key lost their outer neighbours
+        self.__updateTangentsAround((0, len(self.__keys) - 1))
 
     @staticmethod
-    @lru_cache
-    def _evaluate(lhs_time: float, lhs_value: float, lhs_tangent: float, rhs_tangent: float, rhs_time: float, rhs_value: float, time: float) -> float:
+    def _coefficients(lhsValue: float, lhsTangent: float, rhsTangent: float, rhsValue: float) -> tuple[float, float, float, float]:
+        """Cubic coefficients of a segment in normalized time, so y = ((c0 * t + c1) * t + c2) * t + c3."""
         # stepped tangents
-        if lhs_tangent == float('inf'):
-            return lhs_value
-        dx = rhs_time - lhs_time
-        dy = rhs_value - lhs_value
-        c0 = (lhs_tangent + rhs_tangent - dy - dy)
-        c1 = (dy + dy + dy - lhs_tangent - lhs_tangent - rhs_tangent)
-        c2 = lhs_tangent
-        c3 = lhs_value
-        t = (time - lhs_time) / dx
-        return t * (t * (t * c0 + c1) + c2) + c3
+        if lhsTangent == float('inf'):
+            return 0.0, 0.0, 0.0, lhsValue
+        dy = rhsValue - lhsValue
+        c0 = (lhsTangent + rhsTangent - dy - dy)
+        c1 = (dy + dy + dy - lhsTangent - lhsTangent - rhsTangent)
+        return c0, c1, lhsTangent, lhsValue
+
+    def __segmentTable(self) -> tuple[list[float], list[float], list[tuple[float, float, float, float, float, float]]]:
+        if self.__segments is not None:
+            return self.__segments
+        times = self._columns[_TIME].tolist()
+        values = self._columns[_VALUE].tolist()
+        inTangentY = self._columns[_IN_Y]
+        outTangentY = self._columns[_OUT_Y]
+        segments = [(times[i - 1], times[i] - times[i - 1]) + self._coefficients(values[i - 1], outTangentY[i - 1], inTangentY[i], values[i])
+                    for i in range(1, len(times))]
+        self.__segments = times, values, segments
+        return self.__segments
+
+    def __segmentTableArrays(self) -> tuple[Any, Any, Any]:
+        if self.__segmentArrays is not None:
+            return self.__segmentArrays
+        times, values, segments = self.__segmentTable()
+        self.__segmentArrays = (numpy.array(times, dtype=numpy.float64),
+                                numpy.array(values, dtype=numpy.float64),
+                                numpy.array(segments, dtype=numpy.float64).reshape(-1, 6))
+        return self.__segmentArrays
+
+    def __sampleTableFor(self, tolerance: float) -> tuple[float, list[int], list[int], array]:
+        if self.__sampleTable is not None and self.__sampleTable[0] == tolerance:
+            return self.__sampleTable
+        assert tolerance > 0.0, 'Lookup table tolerance must be positive.'
+        offsets = []
+        counts = []
+        samples = array('d')
+        for lhsTime, dx, c0, c1, c2, c3 in self.__segmentTable()[2]:
+            # linearly interpolating samples h apart (in normalized time) is off by at most max|y''| * h * h / 8,
+            # y'' = 6 * c0 * t + 2 * c1 is linear so its maximum is at either end of the segment
+            curvature = max(abs(c1 + c1), abs(6.0 * c0 + c1 + c1))
+            count = curvature / (8.0 * tolerance)
+            count = min(max(1, ceil(sqrt(count))), _MAX_SEGMENT_SAMPLES) if count == count else _MAX_SEGMENT_SAMPLES
+            offsets.append(len(samples))
+            counts.append(count)
+            for j in range(count + 1):
+                t = j / count
+                samples.append(t * (t * (t * c0 + c1) + c2) + c3)
+        self.__sampleTable = tolerance, offsets, counts, samples
+        return self.__sampleTable
+
+    def evaluateSampled(self, time: float, tolerance: float) -> float:
+        """
+        evaluate(time).y to within the given absolute error, for playback.
+        The curve is sampled into a lookup table on first use (or when the tolerance changes),
+        after which evaluating is a lookup and a lerp instead of solving the hermite spline.
+        """
+        times, values, segments = self.__segmentTable()
+        if not times:
+            return 0.0
+
+        if time <= times[0]:
+            return values[0]
+
+        i = bisect_right(times, time)
+        if i == len(times):
+            return values[-1]
+
+        return self.__sampledValue(segments, i, time, tolerance)
+
+    def __sampledValue(self, segments: list[tuple[float, float, float, float, float, float]], i: int, time: float, tolerance: float) -> float:
+        _, offsets, counts, samples = self.__sampleTableFor(tolerance)
+        lhsTime, dx = segments[i - 1][:2]
+        count = counts[i - 1]
+        x = (time - lhsTime) / dx * count
+        j = min(int(x), count - 1)
+        a = samples[offsets[i - 1] + j]
+        return a + (samples[offsets[i - 1] + j + 1] - a) * (x - j)
+
+    def _evaluateNear(self, time: float, hint: int, lutTolerance: float = 0.0) -> tuple[float, int]:
+        """
+        evaluate(time).y (or evaluateSampled(time, lutTolerance) when lutTolerance > 0) for CurveCursor.
+        The segment search starts at the hint, a key index as returned by the previous call, and returns the new one.
+        """
+        times, values, segments = self.__segmentTable()
+        if not times:
+            return 0.0, hint
+
+        if time <= times[0]:
+            return values[0], hint
+
+        # find the first key that is > time, walking a few keys from the hint before doing a binary search
+        n = len(times)
+        i = min(max(hint, 1), n)
+        steps = _CURSOR_STEPS
+        while steps and i < n and times[i] <= time:
+            i += 1
+            steps -= 1
+        while steps and times[i - 1] > time:
+            i -= 1
+            steps -= 1
+        if times[i - 1] > time or (i != n and times[i] <= time):
+            i = bisect_right(times, time)
+
+        if i == n:
+            return values[-1], i
+
+        if lutTolerance > 0.0:
+            return self.__sampledValue(segments, i, time, lutTolerance), i
+
+        lhsTime, dx, c0, c1, c2, c3 = segments[i - 1]
+        t = (time - lhsTime) / dx
+        return t * (t * (t * c0 + c1) + c2) + c3, i
 
     # Define a type that encapsulates the curve evaluation result
     class Evaluation(NamedTuple):
@@ -332,25 +772,53 @@ class Curve:
         Hermite spline interpolation at the given time.
         Times outside the bounds are just clamped to the endpoints.
         """
-        if not self.__keys:
+        times, values, segments = self.__segmentTable()
+        if not times:
             return Curve.Evaluation(0.0, -1, -1)
 
-        if time <= self.__keys[0].time():
-            return Curve.Evaluation(self.__keys[0].value(), 0, 0)
-
-        for i in range(1, len(self.__keys)):
-            key = self.__keys[i]
-            p3 = key.point()
-            # points are sorted so the first one that is > time is the one that defines the segment to evaluate
-            if p3.x <= time:
-                continue
-            # snap to key values if the time is close to it (for rendering)
-            if abs(p3.x - time) < precision:
-                return Curve.Evaluation(p3.y, i - 1 if time < p3.x else i, i)
-            prevKey = self.__keys[i - 1]
-            p0 = prevKey.point()
-            y = self._evaluate(p0.x, p0.y, prevKey.outTangent().y, key.inTangent().y, p3.x, p3.y, time)
-            return Curve.Evaluation(y, i - 1, i)
-
-        last = len(self.__keys) - 1
-        return Curve.Evaluation(self.__keys[last].value(), last, last)
+        if time <= times[0]:
+            return Curve.Evaluation(values[0], 0, 0)
+
+        # keys are sorted so the first one that is > time is the one that defines the segment to evaluate
+        i = bisect_right(times, time)
+        if i == len(times):
+            last = i - 1
+            return Curve.Evaluation(values[last], last, last)
+
+        # snap to key values if the time is close to it (for rendering)
+        if times[i] - time < precision:
+            return Curve.Evaluation(values[i], i - 1, i)
+
+        lhsTime, dx, c0, c1, c2, c3 = segments[i - 1]
+        t = (time - lhsTime) / dx
+        return Curve.Evaluation(t * (t * (t * c0 + c1) + c2) + c3, i - 1, i)
+
+    def evaluateMany(self, times: Sequence[float]) -> Any:
+        """
+        Batch version of evaluate(), without precision snapping or key indices.
+        Returns a float64 ndarray of the same shape as times when numpy is available,
+        a list of floats otherwise.
+        """
+        if numpy is None:
+            return [self.evaluate(time).y for time in times]
+
+        times = numpy.asarray(times, dtype=numpy.float64)
+        keyTimes, values, segments = self.__segmentTableArrays()
+        if not len(keyTimes):
+            return numpy.zeros(times.shape, dtype=numpy.float64)
+        if not len(segments):
+            return numpy.full(times.shape, values[0], dtype=numpy.float64)
+
+        # same search as evaluate(): the first key that is > time closes the segment to evaluate
+        indices = numpy.searchsorted(keyTimes, times, side='right')
+        lhsTime, dx, c0, c1, c2, c3 = segments[numpy.clip(indices - 1, 0, len(segments) - 1)].T
+        # clamped times may land in zero length segments, their results are overwritten below
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            t = (times - lhsTime) / dx
+            result = t * (t * (t * c0 + c1) + c2) + c3
+
+        # times outside the bounds are clamped to the endpoints
+        # the start wins when all keys share one time, like in evaluate()
+        result[(indices == len(keyTimes)) & (times > keyTimes[0])] = values[-1]
+        result[times <= keyTimes[0]] = values[0]
+        return result
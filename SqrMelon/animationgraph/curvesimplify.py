@@ -0,0 +1,126 @@
+"""
+Key reduction: refit a curve with as few of its own keys as possible while staying within a tolerance of the original.
+
+Kept keys preserve the slopes the original curve has on either side of them, so the curve only changes
+between kept keys. Keys that are removed are never replaced by new keys.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from animationgraph.curvedata import Curve, Key, KeyRow
+
+# Number of points per original segment at which the error of a reduced segment is measured.
+SAMPLES_PER_SEGMENT = 8
+
+
+def reduceKeys(curve: Curve, tolerance: float) -> list[Optional[KeyRow]]:
+    """
+    Decide which keys of the curve to keep, greedily splitting spans at the worst fitting key (like Douglas-Peucker).
+
+    Returns a row per key as in Curve.keyData(), or None for keys that can be removed.
+    The first and last key, stepped keys and the key after a stepped key are always kept.
+    Kept keys of which a neighbour was removed get TANGENT_USER tangents that keep the original slopes,
+    other kept keys are returned unchanged.
+    """
+    rows = list(curve.keyData())
+    count = len(rows)
+    if count < 3 or tolerance <= 0.0:
+        return rows  # type: ignore
+
+    times = [row[2] for row in rows]
+    values = [row[3] for row in rows]
+
+    # keys that must stay: ends, stepped keys and their successors, keys sharing their time with a neighbour
+    fixed = [False] * count
+    fixed[0] = fixed[-1] = True
+    for i, row in enumerate(rows):
+        if row[7] == Key.TANGENT_STEPPED:
+            fixed[i] = True
+            if i + 1 < count:
+                fixed[i + 1] = True
+        if i and times[i] == times[i - 1]:
+            fixed[i] = fixed[i - 1] = True
+
+    # the original curve sampled SAMPLES_PER_SEGMENT times per segment, plus the last key
+    sampleTimes = [times[i] + (times[i + 1] - times[i]) * j / SAMPLES_PER_SEGMENT for i in range(count - 1) for j in range(SAMPLES_PER_SEGMENT)]
+    sampleTimes.append(times[-1])
+    samples = curve.evaluateMany(sampleTimes)
+
+    def tangents(lhs: int, rhs: int) -> tuple[float, float]:
+        """Out tangent of lhs and in tangent of rhs (as curve tangents, so slope times segment length) when rhs follows lhs."""
+        if rhs == lhs + 1:
+            return rows[lhs][5], rows[rhs][1]
+        dx = times[rhs] - times[lhs]
+        outSlope = rows[lhs][5] / (times[lhs + 1] - times[lhs])
+        inSlope = rows[rhs][1] / (times[rhs] - times[rhs - 1])
+        return outSlope * dx, inSlope * dx
+
+    def worstSample(lhs: int, rhs: int) -> int:
+        """Index of the worst fitting sample when keys lhs and rhs become neighbours, -1 if all are within tolerance."""
+        outTangent, inTangent = tangents(lhs, rhs)
+        c0, c1, c2, c3 = Curve._coefficients(values[lhs], outTangent, inTangent, values[rhs])
+        dx = times[rhs] - times[lhs]
+        worst = -1
+        worstError = tolerance
+        for index in range(lhs * SAMPLES_PER_SEGMENT, rhs * SAMPLES_PER_SEGMENT + 1):
+            t = (sampleTimes[index] - times[lhs]) / dx
+            error = abs(t * (t * (t * c0 + c1) + c2) + c3 - samples[index])
+            if not error <= worstError:
+                worst = index
+                worstError = error
+        return worst
+
+    keep = list(fixed)
+    spans = []
+    lhs = 0
+    for rhs in range(1, count):
+        if fixed[rhs]:
+            spans.append((lhs, rhs))
+            lhs = rhs
+    while spans:
+        lhs, rhs = spans.pop()
+        if rhs - lhs < 2:
+            continue
+        worst = worstSample(lhs, rhs)
+        if worst == -1:
+            continue
+        # split at the key closest to the worst sample
+        segment = worst // SAMPLES_PER_SEGMENT
+        split = segment if sampleTimes[worst] - times[segment] < times[segment + 1] - sampleTimes[worst] else segment + 1
+        split = min(max(split, lhs + 1), rhs - 1)
+        keep[split] = True
+        spans.append((lhs, split))
+        spans.append((split, rhs))
+
+    kept = [i for i in range(count) if keep[i]]
+    result: list[Optional[KeyRow]] = [None] * count
+    for position, i in enumerate(kept):
+        inTangentX, inTangentY, time, value, outTangentX, outTangentY, tangentBroken, tangentMode = rows[i]
+        prev = kept[position - 1] if position else i - 1
+        following = kept[position + 1] if position + 1 < len(kept) else i + 1
+        if prev == i - 1 and following == i + 1:
+            result[i] = rows[i]
+            continue
+        if position:
+            inTangentX = times[i] - times[prev]
+            inTangentY = tangents(prev, i)[1]
+        if position + 1 < len(kept) and tangentMode != Key.TANGENT_STEPPED:
+            outTangentX = times[following] - times[i]
+            outTangentY = tangents(i, following)[0]
+        inSlope = inTangentY / inTangentX if position and inTangentX else None
+        outSlope = outTangentY / outTangentX if position + 1 < len(kept) and outTangentX else None
+        if tangentMode != Key.TANGENT_STEPPED:
+            tangentMode = Key.TANGENT_USER
+            tangentBroken = int(inSlope is not None and outSlope is not None and inSlope != outSlope)
+        result[i] = (inTangentX, inTangentY, time, value, outTangentX, outTangentY, tangentBroken, tangentMode)
+    return result
+
+
+def simplifyCurve(curve: Curve, tolerance: float) -> int:
+    """Remove keys from the curve as long as it stays within tolerance of the original, returns the number of removed keys."""
+    rows = reduceKeys(curve, tolerance)
+    reduced = [row for row in rows if row is not None]
+    if len(reduced) != len(rows):
+        curve.setKeyData(reduced)
+    return len(rows) - len(reduced)
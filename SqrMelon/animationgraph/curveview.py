@@ -8,7 +8,7 @@ from math import copysign, log10, floor
 from typing import Any, cast, Iterable, Optional, TYPE_CHECKING, Union
 
 import icons
-from animationgraph.curveactions import DeleteAction, DragAction, EditKeyAction, InsertKeyAction, RemappedEvent, SetKeyAction
+from animationgraph.curveactions import DeleteAction, DragAction, EditKeyAction, InsertKeyAction, RemappedEvent, SetKeyAction, SimplifyAction
 from animationgraph.curvedata import Curve, Key
 from animationgraph.curveselection import MarqueeSelectAction, Selection
 from animationgraph.viewactions import CameraFrameAction, CameraPanAction, CameraUndoCommand, CameraZoomAction
@@ -249,6 +249,18 @@ class CurveView(QWidget):
         self.selectionChanged.emit()
         self.update()
 
+    def simplifyCurves(self, curves: Iterable[Curve], tolerance: float) -> int:
+        """Remove as many keys from the given curves as possible while staying within tolerance, returns the number of removed keys."""
+        action = SimplifyAction(curves, tolerance)
+        if action.isEmpty():
+            return 0
+        # selected key indices change
+        self.__selection.clear()
+        self.__undoStack.push(action)
+        self.selectionChanged.emit()
+        self.update()
+        return action.removedCount()
+
     def sceneToPixelDistance(self, point: QPointF, overrideRegion: Optional[Float4] = None) -> QPoint:
         if not overrideRegion:
             w, h = self.__camera.region()[2:]
@@ -533,29 +545,25 @@ class CurveView(QWidget):
             if not len(curve):
                 continue
             identifier = item.text()[-1]
-            if self.__newStyle:
-                painter.setPen(self.__PENS.get(identifier,  self.__PENS['w']))
-            else:
+            if not self.__newStyle:
                 painter.setPen(self.__COLORS.get(identifier, Qt.GlobalColor.red))
-            prevPx = None
-            x = max(start, curve[0].time())
-            while x < min(end, curve[-1].time()):
-                evaluatedCurveData = curve.evaluate(x, precision)
+            # sample each visible segment in one batch, the sample points always include both keys of the segment
+            keyTimes = curve.keyTimes()
+            for i in range(1, len(keyTimes)):
+                lhs = keyTimes[i - 1]
+                rhs = keyTimes[i]
+                if rhs < start or lhs > end:
+                    continue
                 if self.__newStyle:
-                    if self.__selection.isKeySelected(row, evaluatedCurveData.prevKeyIndex) or self.__selection.isKeySelected(row, evaluatedCurveData.keyIndex):
+                    if self.__selection.isKeySelected(row, i - 1) or self.__selection.isKeySelected(row, i):
                         painter.setPen(self.__PENS['selected'])
                     else:
                         painter.setPen(self.__PENS[identifier] if identifier in self.__PENS else self.__PENS['single'])
-                # if they y was snapped, we must snap the x as well
-                if evaluatedCurveData.keyIndex == evaluatedCurveData.prevKeyIndex != -1:
-                    p = QPointF(curve[evaluatedCurveData.keyIndex].time(), evaluatedCurveData.y)
-                else:
-                    p = QPointF(x, evaluatedCurveData.y)
-                px = self.sceneToPixel(p)
-                if prevPx is not None:
-                    painter.drawLine(prevPx, px)
-                prevPx = px
-                x += precision
+                x0 = max(start, lhs)
+                x1 = min(end, rhs)
+                times = [x0 + j * precision for j in range(max(0, int((x1 - x0) / precision)))] + [x1]
+                values = curve.evaluateMany(times)
+                painter.drawPolyline(QPolygon([self.sceneToPixel(QPointF(x, y)) for x, y in zip(times, values)]))
 
     def _drawTangent(self, painter: QPainter, keyPoint: QPoint, tangent: Vec2, pen: QPen) -> None:
         tangentScale = Vec2(self.width() / self.__camera.region()[2], self.height() / self.__camera.region()[3])
@@ -843,8 +851,19 @@ class CurveEditor(QWidget):
         self.__pasteAction.triggered.connect(self.__pasteChannels)
         self.__pasteOverAction = self.__channelMenu.addAction('Paste into selected channel')
         self.__pasteOverAction.triggered.connect(self.__pasteSelectedChannel)
+        self.__simplifyAction = self.__channelMenu.addAction('Simplify selected channel(s)...')
+        self.__simplifyAction.triggered.connect(self.__simplifySelectedChannels)
         self.__clipboard: list[tuple[str, Any]] = []
 
+    def __simplifySelectedChannels(self) -> None:
+        tolerance, ok = QInputDialog.getDouble(self, 'Simplify channels', 'Maximum error:', float(gSettings.value('SimplifyTolerance', 0.001)), 0.0, 1000.0, 6)  # type: ignore
+        if not ok or tolerance <= 0.0:
+            return
+        gSettings.setValue('SimplifyTolerance', tolerance)
+        curves = [self.__model.itemFromIndex(idx).data() for idx in self.__channels.selectedIndexes()]
+        removed = self.__view.simplifyCurves(curves, tolerance)
+        print('Removed %s keys from %s channel(s).' % (removed, len(curves)))
+
     def __copySelectedChannels(self) -> None:
         self.__clipboard = []
         for idx in self.__channels.selectedIndexes():
@@ -879,6 +898,7 @@ class CurveEditor(QWidget):
         self.__copyAction.setEnabled(bool(len(self.__channels.selectedIndexes())))
         self.__pasteAction.setEnabled(bool(self.__clipboard))
         self.__pasteOverAction.setEnabled(len(self.__clipboard) == 1 and len(self.__channels.selectedIndexes()) == 1)
+        self.__simplifyAction.setEnabled(bool(len(self.__channels.selectedIndexes())))
         self.__channelMenu.popup(self.__channels.mapToGlobal(pos))
 
     def __setSelectedKeyTangents(self, state: int) -> None:
@@ -0,0 +1,233 @@
+"""
+Benchmarks for the animation curve engine.
+
+Generates synthetic curves and shots of 10 up to 100k keys with mixed tangent modes and times the main curve operations,
+shot evaluation and baking and scene file round trips. Runs headless, no Qt application is needed.
+
+Results are written to json, when given a baseline json the results are compared to it and
+the script exits with 1 if any measurement got slower by more than the threshold.
+
+Usage:
+    python curvebenchmark.py --output results.json
+    python curvebenchmark.py --output results.json --baseline baseline.json --threshold 0.25
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+from typing import Any, Callable, Optional
+
+from animationgraph.curvedata import Curve, Key, KeyRow, numpy
+from fileutil import FilePath
+from parsecache import clearCache
+from projutil import gSettings, PROJ_EXT, SCENE_EXT, setCurrentProjectFilePath
+from shots import _saveSceneShots, deserializeSceneShots, Shot
+from xmlutil import clearParsedTrees
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+CHANNELS = ('uOrigin.x', 'uOrigin.y', 'uOrigin.z', 'uAngles.x', 'uAngles.y', 'uAngles.z', 'uFade', 'uStrength')
+MODES = (Key.TANGENT_AUTO, Key.TANGENT_SPLINE, Key.TANGENT_LINEAR, Key.TANGENT_FLAT, Key.TANGENT_STEPPED, Key.TANGENT_USER)
+# Number of operations timed per measurement for operations that are too fast to time one by one.
+EVALUATIONS = 1000
+MOVES = 100
+
+
+def randomKeyRows(rng: random.Random, count: int) -> list[KeyRow]:
+    """Keys 0.25 to 1 beats apart with random values and tangent modes, user tangents get random slopes."""
+    rows: list[KeyRow] = []
+    t = 0.0
+    for _ in range(count):
+        mode = rng.choice(MODES)
+        slope = rng.uniform(-2.0, 2.0) if mode == Key.TANGENT_USER else 0.0
+        rows.append((-0.5, -0.5 * slope, t, rng.uniform(-10.0, 10.0), 0.5, 0.5 * slope, False, mode))
+        t += rng.uniform(0.25, 1.0)
+    return rows
+
+
+def randomCurve(rng: random.Random, count: int) -> Curve:
+    curve = Curve()
+    curve.loadKeyData(randomKeyRows(rng, count))
+    return curve
+
+
+def randomShot(rng: random.Random, count: int, sceneName: str = 'benchmark') -> Shot:
+    curves = {name: randomCurve(rng, count) for name in CHANNELS}
+    end = max(curve.keyTimes()[-1] for curve in curves.values())
+    return Shot('shot%d' % count, sceneName, 0.0, end, curves, {}, 1.0, 0.0)
+
+
+def measure(run: Callable[[Any], Any], operations: int, repeat: int, setup: Optional[Callable[[], Any]] = None) -> float:
+    """Best time in seconds per operation over repeat runs, setup() is not timed and its result is passed to run()."""
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - start)
+    return best / operations
+
+
+def benchmarkCurves(rng: random.Random, count: int, repeat: int) -> dict[str, float]:
+    results = {}
+    curve = randomCurve(rng, count)
+    duration = curve.keyTimes()[-1]
+    times = [rng.uniform(-1.0, duration + 1.0) for _ in range(EVALUATIONS)]
+    curve.evaluate(times[0])  # build the segment table outside of the measurement
+    results['Curve.evaluate'] = measure(lambda _: [curve.evaluate(t) for t in times], EVALUATIONS, repeat)
+    results['Curve.evaluateMany'] = measure(lambda _: curve.evaluateMany(times), EVALUATIONS, repeat)
+    results['Curve.clone'] = measure(lambda _: curve.clone(), 1, repeat)
+
+    columns = curve.keyColumns()
+
+    def shuffled() -> Curve:
+        # restoreKeyColumns() takes the keys as they are, the key loaders would sort them
+        order = list(range(count))
+        rng.shuffle(order)
+        result = Curve()
+        result.restoreKeyColumns([array(column.typecode, [column[index] for index in order]) for column in columns])
+        return result
+
+    results['Curve.sortKeys'] = measure(lambda target: target.sortKeys(), 1, repeat, shuffled)
+
+    def moves() -> list[tuple[Key, float]]:
+        target = curve.clone()
+        return [(target[rng.randrange(len(target))], rng.uniform(0.0, duration)) for _ in range(MOVES)]
+
+    def move(keys: list[tuple[Key, float]]) -> None:
+        for key, t in keys:
+            key.setTime(t)
+
+    results['Key.setTime'] = measure(move, MOVES, repeat, moves)
+    return results
+
+
+def benchmarkShots(rng: random.Random, count: int, repeat: int) -> dict[str, float]:
+    results = {}
+    shot = randomShot(rng, count)
+    times = [rng.uniform(shot.start, shot.end) for _ in range(EVALUATIONS)]
+    shot.evaluate(times[0])  # build the evaluation plan outside of the measurement
+
+    def playback(_: Any) -> None:
+        for t in times:
+            shot.evaluate(t)
+
+    results['Shot.evaluate'] = measure(playback, EVALUATIONS, repeat)
+    times.sort()
+    results['Shot.evaluate (sequential)'] = measure(playback, EVALUATIONS, repeat)
+
+    def prerolled() -> Shot:
+        target = shot.clone()
+        target.speed = 1.5
+        target.preroll = 2.0
+        return target
+
+    results['Shot.bake'] = measure(lambda target: target.bake(), 1, repeat, prerolled)
+    return results
+
+
+def benchmarkSceneFiles(rng: random.Random, count: int, repeat: int) -> dict[str, float]:
+    """Save and load a scene with one shot, in a temporary project that is current while this runs."""
+    results = {}
+    shot = randomShot(rng, count)
+    tempDir = FilePath(tempfile.mkdtemp())
+    previousProject = gSettings.value('currentproject') if gSettings.contains('currentproject') else None
+    try:
+        projectFile = tempDir.join('benchmark' + PROJ_EXT)
+        with projectFile.edit() as fh:
+            fh.write('<Project/>')
+        sceneFile = tempDir.join('Scenes', 'benchmark' + SCENE_EXT)
+        sceneFile.ensureExists()
+        with sceneFile.edit() as fh:
+            fh.write('<Scene/>')
+        setCurrentProjectFilePath(projectFile)
+
+        sceneName = FilePath('benchmark')
+        results['_saveSceneShots'] = measure(lambda _: _saveSceneShots(sceneName, [shot]), 1, repeat)
+
+        def coldCaches() -> None:
+            # measure parsing the file, not loading the results of the previous run from the caches
+            clearCache()
+            clearParsedTrees()
+
+        results['deserializeSceneShots'] = measure(lambda _: list(deserializeSceneShots(sceneName)), 1, repeat, coldCaches)
+    finally:
+        if previousProject is None:
+            gSettings.remove('currentproject')
+        else:
+            gSettings.setValue('currentproject', previousProject)
+        shutil.rmtree(tempDir, ignore_errors=True)
+    return results
+
+
+def run(sizes: tuple[int, ...], repeat: int, maxFileKeys: int, seed: int) -> dict[str, Any]:
+    measurements: dict[str, float] = {}
+    for count in sizes:
+        print('Benchmarking %d keys' % count)
+        rng = random.Random(seed + count)
+        suites: list[Callable[[random.Random, int, int], dict[str, float]]] = [benchmarkCurves, benchmarkShots]
+        if count <= maxFileKeys:
+            suites.append(benchmarkSceneFiles)
+        for suite in suites:
+            for name, seconds in suite(rng, count, repeat).items():
+                measurements['%s/%d' % (name, count)] = seconds
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': numpy is not None,
+            'seed': seed,
+            'repeat': repeat,
+            'seconds': measurements}
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Print the ratio of every measurement to the baseline, returns the names of measurements that regressed beyond threshold."""
+    regressions = []
+    for name, seconds in results['seconds'].items():
+        reference = baseline['seconds'].get(name)
+        if not reference:
+            print('%-40s %12.3fus  (new)' % (name, seconds * 1e6))
+            continue
+        ratio = seconds / reference
+        regressed = ratio > 1.0 + threshold
+        if regressed:
+            regressions.append(name)
+        print('%-40s %12.3fus  %6.2fx%s' % (name, seconds * 1e6, ratio, '  REGRESSION' if regressed else ''))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the animation curve engine.')
+    parser.add_argument('--output', default='curvebenchmark.json', help='Json file to write the results to.')
+    parser.add_argument('--baseline', help='Json file of an earlier run to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown relative to the baseline, 0.25 allows 25%% slower.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES), help='Comma separated key counts per curve.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs per measurement, the best run counts.')
+    parser.add_argument('--max-file-keys', type=int, default=10000, help='Largest key count for which scene files are saved and loaded.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = run(tuple(int(size) for size in args.sizes.split(',')), args.repeat, args.max_file_keys, args.seed)
+    with FilePath(args.output).edit() as fh:
+        json.dump(results, fh, indent=1, sort_keys=True)
+
+    if not args.baseline:
+        for name, seconds in results['seconds'].items():
+            print('%-40s %12.3fus' % (name, seconds * 1e6))
+        return 0
+
+    baseline = json.loads(FilePath(args.baseline).content())
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print('%d measurements regressed more than %d%%' % (len(regressions), args.threshold * 100))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
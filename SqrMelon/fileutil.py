@@ -119,12 +119,16 @@ class FilePath(str):
     def __add__(self, other: str) -> FilePath:
         return self.__class__(super(FilePath, self).__add__(other))
 
-    @contextmanager
-    def _open(self, flag: str = 'r') -> Iterator[Union[TextIO, BinaryIO]]:
-        """Forces a file to be readable and writable, then opens it for reading."""
+    def _ensureWritable(self) -> None:
+        """Forces an existing file to be readable and writable."""
         allFlags = stat.S_IREAD | stat.S_IWRITE | stat.S_IRGRP | stat.S_IROTH
         if self.exists() and (os.stat(self).st_mode & allFlags != allFlags):
             os.chmod(self, allFlags)
+
+    @contextmanager
+    def _open(self, flag: str = 'r') -> Iterator[Union[TextIO, BinaryIO]]:
+        """Forces a file to be readable and writable, then opens it for reading."""
+        self._ensureWritable()
         fh = open(self, flag)
         yield fh  # type: ignore
         fh.close()
@@ -141,6 +145,19 @@ class FilePath(str):
         with self._open('w') as fh:
             yield fh  # type: ignore
 
+    @contextmanager
+    def editAtomic(self) -> Iterator[TextIO]:
+        """Like edit(), but writes a temporary file next to this one that replaces this file when done, so the file is never half written."""
+        tempFile = self.__class__(self + '.tmp%d' % os.getpid())
+        try:
+            with open(tempFile, 'w') as fh:
+                yield fh
+            self._ensureWritable()
+            os.replace(tempFile, self)
+        finally:
+            if tempFile.exists():
+                os.remove(tempFile)
+
     @contextmanager
     def readBinary(self) -> Iterator[BinaryIO]:
         """Forces a file to be readable and writable, then opens it for writing."""
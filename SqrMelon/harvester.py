@@ -9,8 +9,9 @@ from xml.etree import cElementTree
 from PySide6.QtWidgets import QApplication
 
 from animationgraph.curvedata import Key
+from animationgraph.curvesimplify import simplifyCurve
 from fileutil import FilePath
-from projutil import currentProjectDirectory, currentProjectFilePath, currentScenesDirectory, iterSceneNames, SCENE_EXT, templatePathFromScenePath
+from projutil import currentProjectAttributes, currentProjectDirectory, currentProjectFilePath, currentScenesDirectory, iterSceneNames, SCENE_EXT, templatePathFromScenePath
 from scene import deserializePasses, PassData
 from shots import deserializeSceneShots, Shot
 
@@ -82,7 +83,8 @@ def gatherEnabledShots(sceneNameIndexMap: Mapping[str, int]) -> list[Shot]:
     return enabledShots
 
 
-def serializeShots(pool: BinaryPool, enabledShots: list[Shot]) -> tuple[int, list[str], int, int, dict[str, FilePath]]:
+def serializeShots(pool: BinaryPool, enabledShots: list[Shot], simplifyTolerance: float = 0.0) -> tuple[int, list[str], int, int, dict[str, FilePath]]:
+    """When simplifyTolerance > 0 curves are exported with as few keys as possible while staying within that error of the original."""
     # Serialize shot times and validate the timeline
     timeCursor = 0.0
     shotEndTimes = []
@@ -112,6 +114,10 @@ def serializeShots(pool: BinaryPool, enabledShots: list[Shot]) -> tuple[int, lis
 
         # Bake preroll and speed before looking at the curves
         shot.bake()
+        if simplifyTolerance > 0.0:
+            removedKeys = sum(simplifyCurve(curve, simplifyTolerance) for curve in shot.curves.values())
+            if removedKeys:
+                print(f'Simplified shot {shot.name}, removed {removedKeys} keys.')
 
         # Serialize shot curves
         # Track unique uniform names and what type they are (vec1,2,3,4)
@@ -150,9 +156,9 @@ def serializeShots(pool: BinaryPool, enabledShots: list[Shot]) -> tuple[int, lis
                 curve = shot.curves[curveName]
 
                 keys = []
-                for key in curve:
-                    oty = float('inf') if key.tangentMode == Key.TANGENT_STEPPED else key.outTangent().y
-                    keys += [key.inTangent().y, key.point().x, key.point().y, oty]
+                for inTangentX, inTangentY, time, value, outTangentX, outTangentY, tangentBroken, tangentMode in curve.keyData():
+                    oty = float('inf') if tangentMode == Key.TANGENT_STEPPED else outTangentY
+                    keys += [inTangentY, time, value, oty]
 
                 # get num keys
                 keysSize = len(keys) // 4
@@ -263,8 +269,9 @@ def main() -> None:
     sceneNameIndexMap: Mapping[str, int] = {name: index for (index, name) in enumerate(iterSceneNames())}
     enabledShots = gatherEnabledShots(sceneNameIndexMap)
 
-    # Add all shots to the demo
-    shotEndTimesIndex, shotSceneNames, shotAnimationInfoIndex, maxAnimations, texturePaths = serializeShots(pool, enabledShots)
+    # Add all shots to the demo, optionally reducing keys to within the ExportSimplifyTolerance set on the project
+    simplifyTolerance = float(currentProjectAttributes().get('ExportSimplifyTolerance', 0.0))
+    shotEndTimesIndex, shotSceneNames, shotAnimationInfoIndex, maxAnimations, texturePaths = serializeShots(pool, enabledShots, simplifyTolerance)
 
     # Add all required render buffers
     fboBlockAddr, fboCount, staticFboCount, fboKeyToIndex, fboFirstCboIndex, cboCount = serializeBuffers(pool, enabledShots)
@@ -7,12 +7,13 @@ import traceback
 from typing import Any, cast, Optional, TextIO
 
 import icons
+from animationbake import AnimationBake
 from animationgraph.curveview import CurveEditor
 from camerawidget import Camera
 from fileutil import FileDialog, FilePath
 from overlays import Overlays
 from profileui import Profiler
-from projutil import currentProjectDirectory, currentProjectFilePath, currentScenesDirectory, gSettings, PROJ_EXT, SCENE_EXT, setCurrentProjectFilePath
+from projutil import currentProjectDirectory, currentProjectFilePath, currentScenesDirectory, gSettings, openProjectIndex, PROJ_EXT, SCENE_EXT, setCurrentProjectFilePath
 from qt import *
 from qtutil import QMainWindowState
 from scene import Scene
@@ -274,6 +275,11 @@ class App(QMainWindowState):
         captureDir = currentProjectDirectory().join('capture')
         captureDir.ensureExists(isFolder=True)
 
+        # bake the animation of the recorded frames once, only frames of which the shot changed since the last recording are evaluated again
+        bake = AnimationBake(FPS)
+        firstFrame = int(self._timer.beatsToSeconds(self._timer.start) * FPS)
+        print('Baked %s animation frames' % bake.update(self.__shotsManager.shots(), self._timer.bpm / 60.0, firstFrame, firstFrame + int(duration * FPS)))
+
         progress = QProgressDialog(self)
         progress.setMaximum(int(duration * FPS))
         prevFrame = 0
@@ -296,8 +302,13 @@ class App(QMainWindowState):
             scene = Scene.getScene(sceneFile)
             scene.setSize(WIDTH, HEIGHT)
 
-            uniforms = self.__shotsManager.evaluate(beats)
-            textureUniforms = self.__shotsManager.additionalTextures(beats)
+            # read the animation from the bake, unless a pinned shot overrides the shot the timeline baked
+            if bake.shotAtFrame(firstFrame + frame) is shot:
+                uniforms = bake.uniforms(firstFrame + frame)
+            else:
+                # its cursors follow the frames so keys are not searched every frame
+                uniforms = shot.evaluateInPlace(beats)
+            textureUniforms = shot.textures
             uOrigin = uniforms['uOrigin']
             uAngles = uniforms['uAngles']
             assert isinstance(uOrigin, list)
@@ -323,6 +334,7 @@ class App(QMainWindowState):
             img.save(captureDir.join('dump_%s_%05d.%s' % (FPS, int(self._timer.beatsToSeconds(self._timer.start) * FPS) + frame, FMT)))
 
         progress.close()
+        bake.close()
 
         convertCaptureDir = currentProjectDirectory().join('convertcapture')
         convertCaptureDir.ensureExists(isFolder=True)
@@ -445,6 +457,7 @@ class App(QMainWindowState):
 
     def __openProject(self, path: str) -> None:
         setCurrentProjectFilePath(FilePath(path))
+        openProjectIndex()
         self.__sceneList.projectOpened()
         self.__shotsManager.projectOpened()
         self._timer.projectOpened()
@@ -0,0 +1,171 @@
+"""
+Sidecar cache of data parsed from the project's xml files.
+
+Parsed results are pickled into the project's cache directory, named after the path and content hash
+of the xml file and the files it includes, so a cache hit skips reading the xml entirely.
+The cache directory is per user and outside the project (see currentCacheDirectory()), so the pickles are only ever read by who wrote them.
+Entries are also named after a hash of the tool's source code, so results pickled by other versions of the code are never loaded.
+An entry also lists the other files its result depends on (with their content hash) and files whose existence it depends on,
+these are verified on every hit and the entry is rebuilt when any of them changed.
+
+File content hashes are remembered with the file size and modification time, so files are only read and hashed again when those change.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+from typing import Any, Callable, Optional
+
+from fileutil import FilePath
+from projutil import currentCacheDirectory, currentProjectFilePath
+from xmlutil import INCLUDE_PATTERN
+
+_FORMAT_VERSION = 2
+
+# path to (size, mtime, content hash, included paths) of files hashed during this session
+_fileDigests: dict[str, tuple[int, int, str, list[FilePath]]] = {}
+_codeDigest: Optional[str] = None
+
+
+def codeDigest() -> str:
+    """Hash of the python source files of this tool and the python version, computed once per session."""
+    global _codeDigest
+    if _codeDigest is None:
+        hasher = hashlib.sha1(('%d:%s' % (_FORMAT_VERSION, sys.version)).encode('utf8'))
+        root = os.path.dirname(os.path.abspath(__file__))
+        for folder, folderNames, fileNames in os.walk(root):
+            folderNames[:] = sorted(name for name in folderNames if not name.startswith(('.', '__')))
+            for fileName in sorted(fileNames):
+                if fileName.endswith('.py'):
+                    path = os.path.join(folder, fileName)
+                    hasher.update(os.path.relpath(path, root).encode('utf8'))
+                    with open(path, 'rb') as fh:
+                        hasher.update(fh.read())
+        _codeDigest = hasher.hexdigest()[:16]
+    return _codeDigest
+
+
+def _fileDigest(path: FilePath) -> tuple[str, list[FilePath]]:
+    """Content hash of a file and the files it includes, files are only read when their size or modification time changed."""
+    stat = os.stat(path)
+    known = _fileDigests.get(path)
+    if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+        return known[2], known[3]
+    with path.readBinary() as fh:
+        content = fh.read()
+    includes = [path.parent().join(match.group(1).strip()) for match in INCLUDE_PATTERN.finditer(content.decode('utf8', 'replace'))]
+    digest = hashlib.sha1(content).hexdigest()
+    _fileDigests[path] = stat.st_size, stat.st_mtime_ns, digest, includes
+    return digest, includes
+
+
+def xmlDigest(path: FilePath) -> str:
+    """Content hash of an xml file combined with the content of the files it includes, as parseXMLWithIncludes() would read them."""
+    digest, includes = _fileDigest(path)
+    if not includes:
+        return digest
+    hasher = hashlib.sha1(digest.encode('ascii'))
+    for include in includes:
+        hasher.update(_fileDigest(include)[0].encode('ascii'))
+    return hasher.hexdigest()
+
+
+def _cacheDirectory() -> FilePath:
+    return currentCacheDirectory().join('parsed')
+
+
+def clearCache() -> None:
+    """Remove all cached results of the current project and forget the file hashes, so the next parse reads every file."""
+    _fileDigests.clear()
+    if currentProjectFilePath() is not None:
+        shutil.rmtree(_cacheDirectory(), ignore_errors=True)
+
+
+class CacheEntry:
+    """Records what a parsed result depends on besides the xml file it was parsed from."""
+
+    def __init__(self) -> None:
+        self.dependencies: list[tuple[FilePath, str]] = []
+        self.checks: list[tuple[FilePath, bool]] = []
+
+    def dependOn(self, path: FilePath) -> None:
+        """The result depends on the content of this xml file (and its includes)."""
+        self.dependencies.append((path, xmlDigest(path)))
+
+    def exists(self, path: FilePath) -> bool:
+        """path.exists() of which the result is remembered, the entry becomes stale when it changes."""
+        result = path.exists()
+        self.checks.append((path, result))
+        return result
+
+    def isValid(self) -> bool:
+        try:
+            if any(xmlDigest(path) != digest for path, digest in self.dependencies):
+                return False
+        except OSError:
+            return False
+        return all(path.exists() == result for path, result in self.checks)
+
+
+def cachedParse(kind: str, xmlFilePath: FilePath, parse: Callable[[CacheEntry], Any]) -> Any:
+    """
+    Return parse(entry) for the given xml file, from the cache when the file and all dependencies recorded in the entry are unchanged.
+    Kind names what is parsed, so multiple parsers can cache results for the same file.
+    Results must be picklable, they are written to the cache before they are returned so callers may modify them.
+    Without an open project nothing is cached.
+    """
+    return cachedParseWithEntry(kind, xmlFilePath, parse)[1]
+
+
+def _withFile(entry: CacheEntry, xmlFilePath: FilePath, digest: str) -> CacheEntry:
+    result = CacheEntry()
+    result.dependencies = [(xmlFilePath, digest)] + entry.dependencies
+    result.checks = list(entry.checks)
+    return result
+
+
+def cachedParseWithEntry(kind: str, xmlFilePath: FilePath, parse: Callable[[CacheEntry], Any]) -> tuple[CacheEntry, Any]:
+    """
+    cachedParse() that also returns what the result depends on, including the xml file itself,
+    so a result that is handed to another process can be checked with isValid() before it is used.
+    """
+    digest = xmlDigest(xmlFilePath)
+    if currentProjectFilePath() is None:
+        entry = CacheEntry()
+        result = parse(entry)
+        return _withFile(entry, xmlFilePath, digest), result
+
+    pathKey = hashlib.sha1(os.path.normcase(os.path.abspath(xmlFilePath)).encode('utf8')).hexdigest()[:16]
+    prefix = '%s-%s-' % (kind, pathKey)
+    cacheFile = _cacheDirectory().join('%s%s-%s.bin' % (prefix, codeDigest(), digest))
+
+    if cacheFile.exists():
+        try:
+            with cacheFile.readBinary() as fh:
+                version, entry, result = pickle.load(fh)
+            if version == _FORMAT_VERSION and entry.isValid():
+                return _withFile(entry, xmlFilePath, digest), result
+        except Exception:
+            pass  # unreadable entries are rebuilt
+
+    entry = CacheEntry()
+    result = parse(entry)
+    try:
+        cacheDir = _cacheDirectory()
+        cacheDir.ensureExists(isFolder=True)
+        # write to a temporary file so other processes never read half written entries
+        tempFile = FilePath(cacheFile + '.tmp%d' % os.getpid())
+        with tempFile.editBinary() as fh:
+            pickle.dump((_FORMAT_VERSION, entry, result), fh, pickle.HIGHEST_PROTOCOL)
+        os.replace(tempFile, cacheFile)
+        # entries for older versions of this file are of no use anymore
+        for name in os.listdir(cacheDir):
+            if name.startswith(prefix) and name.endswith('.bin') and cacheDir.join(name) != cacheFile:
+                os.remove(cacheDir.join(name))
+    except OSError:
+        pass  # caching is optional
+    return _withFile(entry, xmlFilePath, digest), result
+
@@ -1,13 +1,19 @@
+import hashlib
+import os
+import re
 from typing import Iterable, Optional
+from xml.etree import cElementTree
 
-from fileutil import FilePath
+from fileutil import FilePath, FileSystemWatcher
 from qt import *
-from xmlutil import parseXMLWithIncludes
+from xmlutil import parseXMLWithIncludes, readRootAttributes
 
 gSettings = QSettings('SqrMelon.ini', QSettings.Format.IniFormat)
 PROJ_EXT = '.p64'
 TEMPLATE_EXT = '.xml'
 SCENE_EXT = '.xml'
+# #include "name" lines in glsl files that are not inside a block comment.
+GLSL_INCLUDE_PATTERN = re.compile(r'^(?![^/*]*\*/)[\t ]*(#include "[a-z0-9_]+")[\t ]*$', re.MULTILINE | re.IGNORECASE | re.DOTALL)
 
 
 def currentProjectFilePath() -> Optional[FilePath]:
@@ -20,6 +26,18 @@ def setCurrentProjectFilePath(value: str) -> None:
     gSettings.setValue('currentproject', str(value))
 
 
+def currentProjectAttributes() -> dict[str, str]:
+    """Settings stored on the root element of the current project file, empty for legacy projects or when no project is open."""
+    project = currentProjectFilePath()
+    if not project or not project.exists():
+        return {}
+    try:
+        root = cElementTree.fromstring(project.content())
+    except cElementTree.ParseError:
+        return {}
+    return dict(root.attrib)
+
+
 def currentProjectDirectory() -> FilePath:
     # AttributeError if no current project
     projectPath = currentProjectFilePath()
@@ -37,12 +55,43 @@ def currentTemplatesDirectory() -> FilePath:
     return currentProjectDirectory().join('Templates')
 
 
+def currentCacheDirectory() -> FilePath:
+    """
+    Folder for data derived from the project files, it is safe to delete.
+    It is in the user's cache location instead of the project, so it is never shared along with the project.
+    """
+    # AttributeError if no current project
+    projectKey = hashlib.sha1(pathKey(currentProjectDirectory()).encode('utf8')).hexdigest()[:16]
+    return FilePath(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation)).join('SqrMelon', projectKey)
+
+
+def pathKey(path: str) -> str:
+    """Normalized absolute path, to compare paths with."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def glslIncludePath(glslPath: FilePath, match: re.Match[str]) -> FilePath:
+    """The file included by a GLSL_INCLUDE_PATTERN match in the given glsl file."""
+    inc = match.group(1)
+    idx = inc.find('"') + 1
+    label = inc[idx:inc.find('"', idx + 1)]
+    return glslPath.join('..', label).abs().lower()
+
+
 def templatePathFromScenePath(sceneFile: FilePath) -> FilePath:
-    xScene = parseXMLWithIncludes(sceneFile)
-    return sceneFile.join('..', xScene.attrib['template']).abs()
+    index = projectIndex()
+    if index is not None:
+        templatePath = index.templatePathFromScenePath(sceneFile)
+        if templatePath is not None:
+            return templatePath
+    return sceneFile.join('..', readRootAttributes(sceneFile)['template']).abs()
 
 
 def iterSceneNames() -> Iterable[FilePath]:
+    index = projectIndex()
+    if index is not None:
+        yield from index.sceneNames()
+        return
     scenes = currentScenesDirectory()
     if not scenes.exists():
         return
@@ -52,7 +101,17 @@ def iterSceneNames() -> Iterable[FilePath]:
 
 
 def iterTemplateNames() -> Iterable[FilePath]:
-    for templatePath in currentTemplatesDirectory().iter(join=True):
+    index = projectIndex()
+    if index is not None:
+        yield from index.templateNames()
+        return
+    yield from _iterTemplateNames(currentTemplatesDirectory())
+
+
+def _iterTemplateNames(templatesDir: FilePath) -> Iterable[FilePath]:
+    if not templatesDir.exists():
+        return
+    for templatePath in templatesDir.iter(join=True):
         if not templatePath.hasExt(TEMPLATE_EXT):
             continue
         # ensure exists
@@ -71,17 +130,29 @@ def templateFileFromName(name: str) -> FilePath:
     return currentTemplatesDirectory().join(name + TEMPLATE_EXT)
 
 
-def _pathsFromTemplate(templatePath: FilePath, tag: str, sceneDir: Optional[FilePath] = None) -> Iterable[FilePath]:
+def _templateStitches(templatePath: FilePath) -> list[tuple[str, str]]:
+    """Tag and path of every stitch in a template."""
     xTemplate = parseXMLWithIncludes(templatePath)
+    stitches = []
+    for xPass in xTemplate:
+        for xElement in xPass:
+            stitches.append((xElement.tag.lower(), xElement.attrib['path']))
+    return stitches
+
+
+def _pathsFromTemplate(templatePath: FilePath, tag: str, sceneDir: Optional[FilePath] = None) -> Iterable[FilePath]:
     if tag == 'section':
         assert sceneDir
     elif tag in ('shared', 'global'):
         assert not sceneDir
+    index = projectIndex()
+    stitches = index.templateStitches(templatePath) if index is not None else None
+    if stitches is None:
+        stitches = _templateStitches(templatePath)
     baseDir = sceneDir or templatePath.ensureExt(None)
-    for xPass in xTemplate:
-        for xElement in xPass:
-            if xElement.tag.lower() == tag:
-                yield baseDir.join(xElement.attrib['path'])
+    for stitchTag, path in stitches:
+        if stitchTag == tag:
+            yield baseDir.join(path)
 
 
 def sectionPathsFromScene(sceneName: str) -> Iterable[FilePath]:
@@ -95,3 +166,177 @@ def sharedPathsFromTemplate(templateName: str) -> Iterable[FilePath]:
     baseDir = currentTemplatesDirectory()
     templatePath = baseDir.join(templateName + TEMPLATE_EXT)
     return _pathsFromTemplate(templatePath, 'shared')
+
+
+class ProjectIndex:
+    """
+    In memory index of a project: its scenes and templates, the template of each scene, the stitches of each template
+    and the glsl files each stitch includes, with a reverse map to find the files that depend on a file.
+
+    Built once when a project is opened, see openProjectIndex(), and updated by watching the project files,
+    so the project queries in this module are dictionary lookups instead of listing folders and parsing files.
+    Code that writes project files may call update() to not wait for the file system watcher.
+    """
+    def __init__(self, projectFile: FilePath) -> None:
+        self.projectFile = projectFile
+        self.__scenesDir = projectFile.parent().join('Scenes')
+        self.__templatesDir = projectFile.parent().join('Templates')
+        self.__sceneNames: list[FilePath] = []
+        self.__templateNames: list[FilePath] = []
+        # scene name to template path, None when the scene file could not be read
+        self.__sceneTemplates: dict[str, Optional[FilePath]] = {}
+        # pathKey() of a template to the tag and path of its stitches, None when the template could not be read
+        self.__templateStitches: dict[str, Optional[list[tuple[str, str]]]] = {}
+        # pathKey() of a glsl file to the files it includes, and the reverse
+        self.__includes: dict[str, list[FilePath]] = {}
+        self.__includedBy: dict[str, set[str]] = {}
+        self.__watcher = FileSystemWatcher()
+        self.__watcher.fileChanged.connect(self.update)
+        self.__watcher.directoryChanged.connect(self.update)
+        self.__rescanTemplates()
+        self.__rescanScenes()
+
+    def __watch(self, path: FilePath) -> None:
+        # also after changes, as files that are replaced instead of written to drop out of the watcher
+        if path.exists():
+            self.__watcher.addPath(path)
+
+    def __rescanScenes(self) -> None:
+        names = []
+        if self.__scenesDir.exists():
+            self.__watch(self.__scenesDir)
+            names = [scene.name() for scene in self.__scenesDir.iter() if scene.endswith(SCENE_EXT)]
+        for name in set(self.__sceneTemplates) - set(names):
+            del self.__sceneTemplates[name]
+        self.__sceneNames = names
+        for name in names:
+            if name not in self.__sceneTemplates:
+                self.__indexScene(name)
+
+    def __rescanTemplates(self) -> None:
+        self.__watch(self.__templatesDir)
+        self.__templateNames = list(_iterTemplateNames(self.__templatesDir))
+        for name in self.__templateNames:
+            templatePath = self.__templatesDir.join(name + TEMPLATE_EXT)
+            if pathKey(templatePath) not in self.__templateStitches:
+                self.__indexTemplate(templatePath)
+
+    def __indexScene(self, name: str) -> None:
+        sceneFile = self.__scenesDir.join(name + SCENE_EXT)
+        self.__watch(sceneFile)
+        try:
+            templatePath: Optional[FilePath] = sceneFile.join('..', readRootAttributes(sceneFile)['template']).abs()
+        except (OSError, KeyError, cElementTree.ParseError):
+            templatePath = None
+        self.__sceneTemplates[name] = templatePath
+        if templatePath is None:
+            return
+        if pathKey(templatePath) not in self.__templateStitches:
+            self.__indexTemplate(templatePath)
+        for tag, path in self.__templateStitches[pathKey(templatePath)] or ():
+            if tag == 'section':
+                self.__indexGlsl(self.__scenesDir.join(name, path), False)
+
+    def __indexTemplate(self, templatePath: FilePath) -> None:
+        self.__watch(templatePath)
+        try:
+            stitches: Optional[list[tuple[str, str]]] = _templateStitches(templatePath)
+        except (OSError, KeyError, cElementTree.ParseError):
+            stitches = None
+        self.__templateStitches[pathKey(templatePath)] = stitches
+        templateDir = templatePath.ensureExt(None)
+        for tag, path in stitches or ():
+            if tag in ('shared', 'global'):
+                self.__indexGlsl(templateDir.join(path), False)
+            elif tag == 'section':
+                for name, sceneTemplate in self.__sceneTemplates.items():
+                    if sceneTemplate is not None and pathKey(sceneTemplate) == pathKey(templatePath):
+                        self.__indexGlsl(self.__scenesDir.join(name, path), False)
+
+    def __indexGlsl(self, glslPath: FilePath, force: bool) -> None:
+        key = pathKey(glslPath)
+        if not force and key in self.__includes:
+            return
+        self.__watch(glslPath)
+        for include in self.__includes.pop(key, ()):
+            self.__includedBy.get(pathKey(include), set()).discard(key)
+        try:
+            text = glslPath.content()
+        except OSError:
+            text = ''
+        includes = [glslIncludePath(glslPath, match) for match in GLSL_INCLUDE_PATTERN.finditer(text)]
+        self.__includes[key] = includes
+        for include in includes:
+            self.__includedBy.setdefault(pathKey(include), set()).add(key)
+            self.__indexGlsl(include, False)
+
+    def update(self, path: str) -> None:
+        """Update the index for a file or folder of the project that was created, modified or deleted."""
+        path = FilePath(path)
+        key = pathKey(path)
+        if key == pathKey(self.__scenesDir):
+            self.__rescanScenes()
+        elif key == pathKey(self.__templatesDir):
+            self.__rescanTemplates()
+        else:
+            if pathKey(path.parent()) == pathKey(self.__scenesDir) and path.name() in self.__sceneTemplates:
+                self.__indexScene(path.name())
+            if key in self.__templateStitches:
+                self.__indexTemplate(path)
+            if key in self.__includes:
+                self.__indexGlsl(path, True)
+
+    def sceneNames(self) -> list[FilePath]:
+        return list(self.__sceneNames)
+
+    def templateNames(self) -> list[FilePath]:
+        return list(self.__templateNames)
+
+    def templatePathFromScenePath(self, sceneFile: FilePath) -> Optional[FilePath]:
+        """None if the scene is not in this project or its file could not be read."""
+        if pathKey(sceneFile.parent()) != pathKey(self.__scenesDir):
+            return None
+        name = sceneFile.name()
+        if name not in self.__sceneTemplates:
+            # created after the last scan, the watcher will tell us soon but the caller wants to know now
+            if not sceneFile.exists():
+                return None
+            self.__rescanScenes()
+        return self.__sceneTemplates.get(name)
+
+    def templateStitches(self, templatePath: FilePath) -> Optional[list[tuple[str, str]]]:
+        """Tag and path of every stitch in a template, None if the template could not be read."""
+        key = pathKey(templatePath)
+        if key not in self.__templateStitches:
+            self.__indexTemplate(templatePath)
+        stitches = self.__templateStitches[key]
+        return None if stitches is None else list(stitches)
+
+    def dependents(self, path: str) -> set[str]:
+        """pathKey() of the given file and of all glsl files that include it, directly or through other includes."""
+        result = {pathKey(path)}
+        stack = list(result)
+        while stack:
+            for includer in self.__includedBy.get(stack.pop(), ()):
+                if includer not in result:
+                    result.add(includer)
+                    stack.append(includer)
+        return result
+
+
+_projectIndex: Optional[ProjectIndex] = None
+
+
+def openProjectIndex() -> Optional[ProjectIndex]:
+    """Index the current project, from now on the project queries in this module use the index. Requires a Qt application."""
+    global _projectIndex
+    projectFile = currentProjectFilePath()
+    _projectIndex = ProjectIndex(projectFile) if projectFile is not None else None
+    return _projectIndex
+
+
+def projectIndex() -> Optional[ProjectIndex]:
+    """The index of the current project, None if openProjectIndex() was not called for it in this process."""
+    if _projectIndex is not None and _projectIndex.projectFile == currentProjectFilePath():
+        return _projectIndex
+    return None
@@ -0,0 +1,149 @@
+"""
+Dependencies between the passes of a template.
+
+Passes read the frame buffers listed in their inputs and draw into their target frame buffer.
+A pass reads what the passes before it drew into a buffer this frame,
+or when no pass before it draws into the buffer, what the passes after it drew into it last frame.
+Multiple passes may draw into one buffer, e.g. a drawcommand pass that adds geometry on top of a full screen pass,
+so every one of them counts as a producer of the buffer.
+"""
+from __future__ import annotations
+
+import sys
+from typing import Hashable, Iterable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from scene import PassData
+
+
+class RenderGraph:
+    def __init__(self, passes: list[PassData]) -> None:
+        self.__targets = [passData.targetBufferId for passData in passes]
+        writers: dict[int, list[int]] = {}
+        for index, bufferId in enumerate(self.__targets):
+            writers.setdefault(bufferId, []).append(index)
+        self.__writers = writers
+
+        # passes of which each pass reads the output
+        self.producers: list[set[int]] = []
+        for index, passData in enumerate(passes):
+            producers = set()
+            for inputBufferId in passData.inputBufferIds:
+                if not isinstance(inputBufferId, tuple):
+                    # texture file
+                    continue
+                bufferWriters = writers.get(inputBufferId[0], [])
+                earlier = [writer for writer in bufferWriters if writer < index]
+                producers.update(earlier or bufferWriters)
+            self.producers.append(producers)
+
+        self.consumers: list[set[int]] = [set() for _ in passes]
+        for index, producers in enumerate(self.producers):
+            for producer in producers:
+                self.consumers[producer].add(index)
+
+        # passes of which the output never changes after it was drawn once,
+        # because the pass is static and everything it reads comes from such passes too
+        self.constant = [False] * len(passes)
+        changed = True
+        while changed:
+            changed = False
+            for index, passData in enumerate(passes):
+                if not self.constant[index] and not passData.realtime and all(self.constant[producer] for producer in self.producers[index]):
+                    self.constant[index] = changed = True
+
+        self.__live: dict[int, list[bool]] = {}
+
+        # first and last pass that use each buffer, None when what is in the buffer has to survive until the next frame
+        self.lifetimes: dict[int, Optional[tuple[int, int]]] = {}
+        for bufferId, bufferWriters in writers.items():
+            if passes[bufferWriters[0]].drawCommand is not None or not all(passes[writer].realtime for writer in bufferWriters):
+                # drawn over what was there last frame, or drawn once and read for many frames
+                self.lifetimes[bufferId] = None
+            else:
+                self.lifetimes[bufferId] = bufferWriters[0], bufferWriters[-1]
+        for index, passData in enumerate(passes):
+            for inputBufferId in passData.inputBufferIds:
+                if not isinstance(inputBufferId, tuple):
+                    continue
+                lifetime = self.lifetimes.get(inputBufferId[0])
+                if lifetime is None or lifetime[0] >= index:
+                    # read before it is drawn, so this reads last frame
+                    self.lifetimes[inputBufferId[0]] = None
+                else:
+                    self.lifetimes[inputBufferId[0]] = lifetime[0], max(lifetime[1], index)
+
+    def live(self, displayPass: int) -> list[bool]:
+        """
+        Per pass whether it contributes to the target buffer of the given pass as it is after drawing up to and including that pass.
+        Passes that do not contribute can be skipped when that buffer is displayed.
+        """
+        live = self.__live.get(displayPass)
+        if live is not None:
+            return live
+        live = [False] * len(self.__targets)
+        if 0 <= displayPass < len(self.__targets):
+            stack = [writer for writer in self.__writers[self.__targets[displayPass]] if writer <= displayPass]
+            while stack:
+                index = stack.pop()
+                if live[index]:
+                    continue
+                live[index] = True
+                stack.extend(self.producers[index])
+        self.__live[displayPass] = live
+        return live
+
+    def downstream(self, passIds: Iterable[int]) -> set[int]:
+        """The given passes and all passes that read their output, directly or indirectly."""
+        result = set()
+        stack = list(passIds)
+        while stack:
+            index = stack.pop()
+            if index in result:
+                continue
+            result.add(index)
+            stack.extend(self.consumers[index])
+        return result
+
+
+def shareResources(users: list[tuple[Hashable, Optional[tuple[int, int]]]]) -> list[int]:
+    """
+    Share resources between users that are never in use at the same time.
+    Takes per user the kind of resource it needs and its lifetime as the first and last pass that use it,
+    None for users that must have a resource of their own and an empty range (first > last) for users that are never used.
+    Returns the index of the resource per user, users with equal indices share a resource.
+    """
+    result = [-1] * len(users)
+    # last pass that uses each resource and its kind
+    resources: list[tuple[int, Hashable]] = []
+    unused = []
+    for user in sorted(range(len(users)), key=lambda user: (users[user][1] or (-1, -1))[0]):
+        kind, lifetime = users[user]
+        if lifetime is None:
+            # never free
+            result[user] = len(resources)
+            resources.append((sys.maxsize, kind))
+            continue
+        first, last = lifetime
+        if first > last:
+            unused.append(user)
+            continue
+        for index, (end, resourceKind) in enumerate(resources):
+            if resourceKind == kind and end < first:
+                break
+        else:
+            index = len(resources)
+            resources.append((last, kind))
+        resources[index] = last, kind
+        result[user] = index
+
+    for user in unused:
+        kind = users[user][0]
+        for index, (_, resourceKind) in enumerate(resources):
+            if resourceKind == kind:
+                break
+        else:
+            index = len(resources)
+            resources.append((-1, kind))
+        result[user] = index
+    return result
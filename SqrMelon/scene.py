@@ -1,22 +1,25 @@
 from __future__ import annotations
 
 import ctypes
+import functools
 import html
-import re
 import time
-from typing import Any, cast, Iterable, Iterator, Optional, overload, Union
+from typing import Any, cast, Hashable, Iterable, Iterator, NamedTuple, Optional, overload, Union
 
-from OpenGL.GL import GL_CURRENT_PROGRAM, GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST, GL_FLOAT, GL_FRAGMENT_SHADER, GL_LINEAR, GL_LINEAR_MIPMAP_LINEAR, GL_RGBA, GL_TEXTURE0, GL_TEXTURE_2D, GL_TEXTURE_3D, GL_TEXTURE_MAG_FILTER, GL_TEXTURE_MIN_FILTER, GL_TRIANGLE_FAN, GL_UNSIGNED_BYTE, GL_VERTEX_SHADER, glActiveTexture, glBindTexture, glBindVertexArray, glClear, glDeleteFramebuffers, glDeleteTextures, glDisable, glDrawArrays, glEnable, glFinish, glGenerateMipmap, glGenTextures, glGenVertexArrays, glGetIntegerv, glGetTexImage, glGetUniformLocation, glTexImage2D, glTexParameterf, glTexParameteri, glUniform1f, glUniform1fv, glUniform1i, glUniform1iv, glUniform1uiv, glUniform2f, glUniform3f, glUniform4f, glUniformMatrix3fv, glUniformMatrix4fv, glUseProgram, glViewport, shaders
+from OpenGL.GL import GL_ACTIVE_UNIFORMS, GL_CURRENT_PROGRAM, GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST, GL_FLOAT, GL_FRAGMENT_SHADER, GL_LINEAR, GL_LINEAR_MIPMAP_LINEAR, GL_RGBA, GL_TEXTURE0, GL_TEXTURE_2D, GL_TEXTURE_3D, GL_TEXTURE_MAG_FILTER, GL_TEXTURE_MIN_FILTER, GL_TRIANGLE_FAN, GL_UNSIGNED_BYTE, GL_VERTEX_SHADER, glActiveTexture, glBindTexture, glBindVertexArray, glClear, glDeleteFramebuffers, glDeleteTextures, glDisable, glDrawArrays, glEnable, glFinish, glGenerateMipmap, glGenTextures, glGenVertexArrays, glGetActiveUniform, glGetIntegerv, glGetProgramiv, glGetTexImage, glGetUniformLocation, glTexImage2D, glTexParameterf, glTexParameteri, glUniform1f, glUniform1fv, glUniform1i, glUniform1iv, glUniform1uiv, glUniform2f, glUniform3f, glUniform4f, glUniformMatrix3fv, glUniformMatrix4fv, glUseProgram, glViewport, shaders
 from OpenGL.GL.EXT import texture_filter_anisotropic
 
 from buffers import FrameBuffer, Texture, Texture3D
 from fileutil import FilePath, FileSystemWatcher
 from gl_shaders import compileProgram
 from heightfield import loadHeightfield
-from projutil import currentProjectDirectory, currentProjectFilePath, templatePathFromScenePath
+from parsecache import cachedParse, cachedParseWithEntry, CacheEntry
+from projutil import currentProjectDirectory, currentProjectFilePath, GLSL_INCLUDE_PATTERN, glslIncludePath, pathKey, projectIndex, templatePathFromScenePath
 from qt import *
 from qtutil import hlayout, vlayout
-from xmlutil import parseXMLWithIncludes
+from rendergraph import RenderGraph, shareResources
+from uniformblock import uniformBlockLayout, UniformBlockBuffer, UniformBlockLayout
+from xmlutil import parseXMLWithIncludes, readRootAttributes
 
 tick = 0
 
@@ -98,10 +101,32 @@ class PassData:
         self.name = label
 
 
+# passes parsed by other processes with what they depend on, see preloadPasses()
+_preloadedPasses: dict[FilePath, tuple[CacheEntry, list[PassData]]] = {}
+
+
 def deserializePasses(sceneFile: FilePath) -> list[PassData]:
     assert isinstance(sceneFile, FilePath)
+    preloaded = _preloadedPasses.pop(sceneFile, None)
+    if preloaded is not None and preloaded[0].isValid():
+        return preloaded[1]
+    return cachedParse('passes', sceneFile, functools.partial(_parsePasses, sceneFile))
+
+
+def deserializePassesWithEntry(sceneFile: FilePath) -> tuple[CacheEntry, list[PassData]]:
+    """deserializePasses() for another process, which can hand the result back with preloadPasses()."""
+    return cachedParseWithEntry('passes', sceneFile, functools.partial(_parsePasses, sceneFile))
+
+
+def preloadPasses(sceneFile: FilePath, entry: CacheEntry, passes: list[PassData]) -> None:
+    """The next deserializePasses() of the scene returns the given passes, unless a file they depend on changed since."""
+    _preloadedPasses[sceneFile] = entry, passes
+
+
+def _parsePasses(sceneFile: FilePath, entry: CacheEntry) -> list[PassData]:
     sceneDir = sceneFile.stripExt()
     templatePath = templatePathFromScenePath(sceneFile)
+    entry.dependOn(templatePath)
     templateDir = templatePath.stripExt()
     xTemplate = parseXMLWithIncludes(templatePath)
     passes = []
@@ -144,7 +169,7 @@ def deserializePasses(sceneFile: FilePath) -> list[PassData]:
             # input is filename?
             parentPath = currentProjectDirectory()
             fullName = parentPath.join(xPass.attrib[key])
-            if fullName.exists():
+            if entry.exists(fullName):
                 inputs.append(FilePath(xPass.attrib[key]))
             else:
                 # input is buffer
@@ -228,9 +253,117 @@ class CameraTransform:
         self.data[3:6] = rotate
 
 
+class UniformInfo(NamedTuple):
+    location: int
+    type: int
+    # number of array elements from this one on, 1 for uniforms that are not arrays
+    size: int
+
+
+def _activeUniforms(program: int) -> dict[str, UniformInfo]:
+    """
+    The uniforms a linked program uses by name.
+    Arrays are listed by their plain name and by the name of each element, e.g. uImages, uImages[0], uImages[1].
+    """
+    table = {}
+    for index in range(int(glGetProgramiv(program, GL_ACTIVE_UNIFORMS))):
+        name, size, uniformType = glGetActiveUniform(program, index)
+        if isinstance(name, bytes):
+            name = name.decode('ascii')
+        location = glGetUniformLocation(program, name)
+        if location == -1:
+            # members of uniform blocks have no location
+            continue
+        if not name.endswith('[0]'):
+            table[name] = UniformInfo(location, uniformType, size)
+            continue
+        baseName = name[:-3]
+        table[baseName] = UniformInfo(location, uniformType, size)
+        for element in range(size):
+            elementName = '%s[%d]' % (baseName, element)
+            table[elementName] = UniformInfo(glGetUniformLocation(program, elementName), uniformType, size - element)
+    return table
+
+
+class ProgramUniforms:
+    """
+    The uniforms a linked program uses, see _activeUniforms(), and the last value set to each.
+    Programs keep their uniform values, so setting a value the program already has is skipped.
+    Values must be set while the program is in use.
+    """
+
+    def __init__(self, program: int, block: Optional[UniformBlockBuffer] = None) -> None:
+        self.table = _activeUniforms(program)
+        # buffer for the uniform block when the program declares it, its members are not in the table
+        self.block = block
+        # last value set per location, as compared by set()
+        self.__values: dict[int, Any] = {}
+        # reused ctypes buffers for matrix uploads per location
+        self.__matrices: dict[int, ctypes.Array[ctypes.c_float]] = {}
+
+    def get(self, name: str) -> Optional[UniformInfo]:
+        return self.table.get(name)
+
+    def forget(self) -> None:
+        """Call when uniforms of the program may have been set without going through this object."""
+        self.__values.clear()
+
+    def setInt(self, name: str, value: int) -> None:
+        uniform = self.table.get(name)
+        if uniform is None or self.__values.get(uniform.location) == value:
+            return
+        glUniform1i(uniform.location, value)
+        self.__values[uniform.location] = value
+
+    def set(self, name: str, value: Any) -> None:
+        """Set a float, 1 to 4 floats, a 3x3 or 4x4 matrix as 9 or 16 floats, or a ctypes array of floats, doubles or (unsigned) ints."""
+        uniform = self.table.get(name)
+        if uniform is None:
+            # not used by this program
+            return
+        location = uniform.location
+        if isinstance(value, float):
+            if self.__values.get(location) != value:
+                glUniform1f(location, value)
+                self.__values[location] = value
+            return
+
+        size = len(value)
+        if size in (1, 2, 3, 4, 9, 16):
+            key = tuple(value)
+            if self.__values.get(location) == key:
+                return
+            self.__values[location] = key
+            if size == 9 or size == 16:
+                matrix = self.__matrices.get(location)
+                if matrix is None or len(matrix) != size:
+                    matrix = self.__matrices[location] = (ctypes.c_float * size)()
+                matrix[:] = key
+                (glUniformMatrix3fv if size == 9 else glUniformMatrix4fv)(location, 1, False, matrix)
+            else:
+                (glUniform1f, glUniform2f, glUniform3f, glUniform4f)[size - 1](location, *key)
+            return
+
+        # has to be a c-type array
+        data = bytes(value)
+        if self.__values.get(location) == data:
+            return
+        self.__values[location] = data
+        typeName = type(value).__name__
+        if typeName.startswith('c_float') or typeName.startswith('c_double'):
+            glUniform1fv(location, size, value)
+        elif typeName.startswith('c_u'):
+            glUniform1uiv(location, size, value)
+        else:
+            glUniform1iv(location, size, value)
+
+
 class _ShaderPool:
     def __init__(self) -> None:
         self.__cache: dict[tuple[str, str], int] = {}
+        self.__uniforms: dict[int, ProgramUniforms] = {}
+        # programs that declare the same uniform block share its buffer
+        self.__blocks: dict[UniformBlockLayout, UniformBlockBuffer] = {}
 
     def compileProgram(self, vertCode: str, fragCode: str) -> int:
         """A compileProgram version that ensures we don't recompile unnecessarily."""
@@ -243,21 +376,36 @@ class _ShaderPool:
             validate=False
         )
         self.__cache[(vertCode, fragCode)] = program
+        # look up all uniforms once, instead of asking the driver for every uniform every frame
+        self.__register(program)
         return program
 
+    def __register(self, program: int) -> ProgramUniforms:
+        block = None
+        layout = uniformBlockLayout(program)
+        if layout is not None:
+            block = self.__blocks.get(layout)
+            if block is None:
+                block = self.__blocks[layout] = UniformBlockBuffer(layout)
+        uniforms = self.__uniforms[program] = ProgramUniforms(program, block)
+        return uniforms
+
+    def uniforms(self, program: int) -> ProgramUniforms:
+        """The uniforms a program uses, uniforms that are not in it can be skipped."""
+        uniforms = self.__uniforms.get(program)
+        if uniforms is None:
+            uniforms = self.__register(program)
+        return uniforms
+
 
 gShaderPool = _ShaderPool()
 
 
 def _loadGLSLWithIncludes(glslPath: FilePath, ioIncludePaths: set[FilePath]) -> str:
     assert isinstance(glslPath, FilePath)
-    search = re.compile(r'^(?![^/*]*\*/)[\t ]*(#include "[a-z0-9_]+")[\t ]*$', re.MULTILINE | re.IGNORECASE | re.DOTALL)
     text = glslPath.content()
-    for res in list(search.finditer(text)):
-        inc = res.group(1)
-        idx = inc.find('"') + 1
-        label = inc[idx:inc.find('"', idx + 1)]
-        path = glslPath.join('..', label).abs().lower()
+    for res in list(GLSL_INCLUDE_PATTERN.finditer(text)):
+        path = glslIncludePath(glslPath, res)
         assert path not in ioIncludePaths, 'Recursive or duplicate include "%s" found while parsing "%s"' % (
             path, glslPath)
         ioIncludePaths.add(path)
@@ -299,7 +447,7 @@ class Scene(QObject):
 
         colorBuffer.use()
 
-        glUniform1i(glGetUniformLocation(passThrough, 'uImages[0]'), 0)
+        gShaderPool.uniforms(passThrough).setInt('uImages[0]', 0)
         glViewport(*viewport)
 
         FullScreenRectSingleton.instance().draw()
@@ -318,7 +466,7 @@ class Scene(QObject):
     def usePassThroughProgram(cls, color: tuple[float, float, float, float] = (1.0, 1.0, 1.0, 1.0)) -> int:
         passThrough = cls.getPassThroughProgram()
         glUseProgram(passThrough)
-        glUniform4f(glGetUniformLocation(passThrough, 'uColor'), *color)
+        gShaderPool.uniforms(passThrough).set('uColor', color)
         return passThrough
 
     @classmethod
@@ -344,10 +492,15 @@ class Scene(QObject):
         self._debugPassId: Optional[tuple[int, int]] = None
 
         self.passes: list[PassData] = []
+        self.__graph = RenderGraph([])
         self.__passDirtyState: list[bool] = []
         self.shaders: list[int] = []
         self.frameBuffers: list[FrameBuffer] = []
         self.colorBuffers: list[list[Union[Texture, Texture3D]]] = []
+        # all textures created by setSize, buffers may share them
+        self.__renderTargets: list[Texture] = []
+        # per frame buffer position the buffer data and size, frame buffer, color buffers and textures of buffers that setSize() may keep
+        self.__constantTargets: dict[int, tuple[Any, FrameBuffer, list[Union[Texture, Texture3D]], list[Texture]]] = {}
         self.profileLog: list[tuple[str, float]] = []
 
         self.__filePath = sceneFile
@@ -388,6 +541,7 @@ class Scene(QObject):
             self.fileSystemWatcher_scene.addPath(path)
 
         self.passes = deserializePasses(self.__filePath)
+        self.__graph = RenderGraph(self.passes)
 
         self.fileSystemWatcher = FileSystemWatcher()
         self.fileSystemWatcher.fileChanged.connect(self._rebuild)
@@ -409,17 +563,23 @@ class Scene(QObject):
                 # the scene has been deleted, stop watching it
                 return
             self.fileSystemWatcher.addPath(path)
-            path = path.abs()
 
+        # the changed file and the stitches that include it
+        changed: Optional[set[str]] = None
+        if path is not None:
+            projIndex = projectIndex()
+            changed = projIndex.dependents(path) if projIndex is not None else {pathKey(path)}
+
+        rebuilt = []
         for i, passData in enumerate(self.passes):
             vert = True
             frag = True
 
             # make sure the changed path is in our dependencies
-            if path is not None:
-                if path not in (stitch.abs() for stitch in passData.vertStitches):  # type: ignore
+            if changed is not None:
+                if not any(pathKey(stitch) in changed for stitch in passData.vertStitches):
                     vert = False
-                if path not in (stitch.abs() for stitch in passData.fragStitches):  # type: ignore
+                if not any(pathKey(stitch) in changed for stitch in passData.fragStitches):
                     frag = False
                 if not vert and not frag:
                     continue
@@ -495,6 +655,16 @@ class Scene(QObject):
             while len(self.shaders) <= i:
                 self.shaders.append(0)
             self.shaders[i] = program
+            rebuilt.append(i)
+
+            # template uniforms are constant, set them once now instead of every frame
+            if passData.uniforms:
+                current = glGetIntegerv(GL_CURRENT_PROGRAM)
+                glUseProgram(program)
+                programUniforms = gShaderPool.uniforms(program)
+                for uniformName, value in passData.uniforms.items():
+                    programUniforms.set(uniformName, value)
+                glUseProgram(current)
 
             # 3D texture dirties, lets reset its buffers too
             # This pass wants to write to a 3D texture
@@ -507,7 +677,12 @@ class Scene(QObject):
                         self.colorBuffers[i][j] = buffer.original
                         self.__passDirtyState[i] = True
 
-        self.__passDirtyState = [True] * len(self.passes)
+        if path is None and index is None:
+            self.__passDirtyState = [True] * len(self.passes)
+        else:
+            # static passes only draw again when their program or something they read changed
+            for i in self.__graph.downstream(rebuilt):
+                self.__passDirtyState[i] = True
         self.__errorDialog.close()
 
     def cameraData(self) -> CameraTransform:
@@ -529,9 +704,11 @@ class Scene(QObject):
                     if xSub.attrib['name'] == self.__filePath.name():
                         xCamera = xSub
                         break
-            if xCamera is None:  # legacy support
-                xCamera = parseXMLWithIncludes(self.__filePath)
-            self.__cameraData = CameraTransform(*[float(element) for element in xCamera.attrib['camera'].split(',')])
+            if xCamera is not None:
+                camera = xCamera.attrib['camera']
+            else:  # legacy support
+                camera = readRootAttributes(self.__filePath)['camera']
+            self.__cameraData = CameraTransform(*[float(element) for element in camera.split(',')])
         return self.__cameraData
 
     def setSize(self, w: int, h: int) -> None:
@@ -570,31 +747,101 @@ class Scene(QObject):
         numBuffers += 2
         bufferData[numBuffers - 1] = 1, 1, None, False
 
-        for fbo in self.frameBuffers:
-            glDeleteFramebuffers(1, int(fbo.id()))
-        for cbos in self.colorBuffers:
-            for cbo in cbos:
-                glDeleteTextures(1, int(cbo.id()))
-
-        self.frameBuffers.clear()
-        self.colorBuffers.clear()
+        # frame buffers are indexed by target buffer id, so buffer -1 is the last one
+        sizes = []
         for value in bufferData.values():
             if value[2] is not None:
-                w, h = value[2]
+                sizes.append(value[2])
             elif value[1] is not None:
-                w, h = self.__w // value[1], self.__h // value[1]
+                sizes.append((self.__w // value[1], self.__h // value[1]))
             else:
-                w, h = self.__w, self.__h
+                sizes.append((self.__w, self.__h))
+
+        # buffers of which the size does not follow the view and that only constant passes draw into
+        # keep their textures across resizes, so what was drawn into them does not have to be drawn again
+        constantTargets = []
+        for position, value in enumerate(bufferData.values()):
+            writers = [i for i, passData in enumerate(self.passes) if passData.targetBufferId % len(sizes) == position]
+            constantTargets.append(value[2] is not None and bool(writers) and all(self.__graph.constant[i] for i in writers))
+        kept: dict[int, tuple[Any, FrameBuffer, list[Union[Texture, Texture3D]], list[Texture]]] = {}
+        for position, (value, size) in enumerate(zip(bufferData.values(), sizes)):
+            previous = self.__constantTargets.get(position)
+            if constantTargets[position] and previous is not None and previous[0] == (value, size):
+                kept[position] = previous
+        keptTextureIds = {int(texture.id()) for _, _, colorBuffers, textures in kept.values() for texture in list(colorBuffers) + textures}
+
+        for fbo in self.frameBuffers:
+            if not any(fbo is frameBuffer for _, frameBuffer, _, _ in kept.values()):
+                glDeleteFramebuffers(1, int(fbo.id()))
+        textureIds = {int(texture.id()) for texture in self.__renderTargets}
+        textureIds.update(int(cbo.id()) for cbos in self.colorBuffers for cbo in cbos)
+        for textureId in textureIds - keptTextureIds:
+            glDeleteTextures(1, textureId)
+
+        self.frameBuffers.clear()
+        self.colorBuffers.clear()
+        self.__renderTargets.clear()
+        self.__constantTargets = {}
+
+        lifetimes: list[Optional[tuple[int, int]]] = []
+        for position in range(len(sizes)):
+            if constantTargets[position]:
+                # never shared, so it can be kept
+                lifetimes.append(None)
+                continue
+            lifetime: Optional[tuple[int, int]] = (len(self.passes), -1)
+            for bufferId in (position, position - len(sizes)):
+                if bufferId not in self.__graph.lifetimes:
+                    continue
+                other = self.__graph.lifetimes[bufferId]
+                if lifetime is None or other is None:
+                    lifetime = None
+                else:
+                    lifetime = min(lifetime[0], other[0]), max(lifetime[1], other[1])
+            lifetimes.append(lifetime)
+
+        # buffers that are not in use at the same time share textures
+        colorUsers: list[tuple[Hashable, Optional[tuple[int, int]]]] = []
+        depthUsers: list[tuple[Hashable, Optional[tuple[int, int]]]] = []
+        for value, size, lifetime in zip(bufferData.values(), sizes, lifetimes):
+            colorUsers.extend([((size, value[3]), lifetime)] * value[0])
+            depthUsers.append((size, lifetime))
+        colorTextures: dict[int, Texture] = {}
+        depthTextures: dict[int, Texture] = {}
+        colorAssignment = iter(shareResources(colorUsers))
+        depthAssignment = shareResources(depthUsers)
+
+        for position, (value, (w, h), depthIndex) in enumerate(zip(bufferData.values(), sizes, depthAssignment)):
+            if position in kept:
+                self.__constantTargets[position] = kept[position]
+                _, frameBuffer, colorBuffers, textures = kept[position]
+                for _ in range(value[0]):
+                    next(colorAssignment)
+                self.frameBuffers.append(frameBuffer)
+                self.colorBuffers.append(colorBuffers)
+                self.__renderTargets.extend(textures)
+                continue
 
             self.frameBuffers.append(FrameBuffer(w, h))
-            self.frameBuffers[-1].initDepth(Texture(Texture.FLOAT_DEPTH, w, h))
+            if depthIndex not in depthTextures:
+                depthTextures[depthIndex] = Texture(Texture.FLOAT_DEPTH, w, h)
+            self.frameBuffers[-1].initDepth(depthTextures[depthIndex])
             self.colorBuffers.append([])
             for j in range(value[0]):
-                lastCbo = Texture(Texture.RGBA32F, w, h, tile=value[3])
+                colorIndex = next(colorAssignment)
+                if colorIndex not in colorTextures:
+                    colorTextures[colorIndex] = Texture(Texture.RGBA32F, w, h, tile=value[3])
+                lastCbo = colorTextures[colorIndex]
                 self.colorBuffers[-1].append(lastCbo)
                 self.frameBuffers[-1].addTexture(lastCbo)
+            if constantTargets[position]:
+                self.__constantTargets[position] = (value, (w, h)), self.frameBuffers[-1], self.colorBuffers[-1], [depthTextures[depthIndex]] + self.colorBuffers[-1]  # type: ignore
+        self.__renderTargets.extend(colorTextures.values())
+        self.__renderTargets.extend(depthTextures.values())
 
-        self.__passDirtyState = [True] * len(self.passes)
+        # passes that drew into kept buffers are done, unless they were waiting to draw
+        dirtyState = self.__passDirtyState + [True] * (len(self.passes) - len(self.__passDirtyState))
+        self.__passDirtyState = [dirty or passData.targetBufferId % len(sizes) not in kept for passData, dirty in zip(self.passes, dirtyState)]
 
     def _bindInputs(self, passId: int, additionalTextureUniforms: Optional[dict[str, FilePath]] = None) -> int:
         j2d = 0
@@ -612,13 +859,14 @@ class Scene(QObject):
                 TexturePool.fetchAndUse(filePath)
         glUseProgram(program)  # restore program
 
+        programUniforms = gShaderPool.uniforms(self.shaders[passId])
         for j, inpt in enumerate(self.passes[passId].inputBufferIds):
             glActiveTexture(GL_TEXTURE0 + j)
 
             if isinstance(inpt, str):
                 # input is texture file name
                 TexturePool.fetchAndUse(inpt)
-                glUniform1i(glGetUniformLocation(self.shaders[passId], 'uImages[%s]' % j2d), j)
+                programUniforms.setInt('uImages[%s]' % j2d, j)
                 j2d += 1
                 continue
 
@@ -629,10 +877,10 @@ class Scene(QObject):
                 raise IndexError('Template for current scene has inputs fetching from non-existant buffers.')
             inputBuffer.use()
             if isinstance(inputBuffer, Texture3D):
-                glUniform1i(glGetUniformLocation(self.shaders[passId], 'uImages3D[%s]' % j3d), j)
+                programUniforms.setInt('uImages3D[%s]' % j3d, j)
                 j3d += 1
             else:
-                glUniform1i(glGetUniformLocation(self.shaders[passId], 'uImages[%s]' % j2d), j)
+                programUniforms.setInt('uImages[%s]' % j2d, j)
                 j2d += 1
 
         if additionalTextureUniforms:
@@ -640,7 +888,7 @@ class Scene(QObject):
                 j += 1
                 glActiveTexture(GL_TEXTURE0 + j)
                 TexturePool.fetchAndUse(additionalTextureUniforms[uniformName])
-                glUniform1i(glGetUniformLocation(self.shaders[passId], uniformName), j)
+                programUniforms.setInt(uniformName, j)
 
         return j + 1
 
@@ -650,22 +898,18 @@ class Scene(QObject):
             glActiveTexture(GL_TEXTURE0 + j)
             glBindTexture(GL_TEXTURE_2D, 0)
 
+    def _livePasses(self) -> list[bool]:
+        """Per pass whether it contributes to the buffer that is displayed, passes that do not are not drawn."""
+        if self._debugPassId is None:
+            return self.__graph.live(len(self.passes) - 1)
+        return self.__graph.live(self._debugPassId[0])
+
     def drawToScreen(self, seconds: float, beats: float, uniforms: dict[str, Any], viewport: tuple[int, int, int, int], additionalTextureUniforms: Optional[dict[str, FilePath]] = None) -> None:
         if not self.shaders:
             # compiler errors
             return
 
-        # clear all frame buffers from Z before draw
         glEnable(GL_DEPTH_TEST)
-        toClear = []
-        for i, passData in enumerate(self.passes):
-            if not self.__passDirtyState[i]:
-                continue
-            toClear.append(passData.targetBufferId)
-        for i in sorted(list(set(toClear))):
-            self.frameBuffers[i].use()
-            glClear(GL_DEPTH_BUFFER_BIT)
-
         maxActiveInputs = max(1, self.draw(seconds, beats, uniforms, additionalTextureUniforms=additionalTextureUniforms))
         self._unbindInputs(maxActiveInputs)
 
@@ -677,6 +921,38 @@ class Scene(QObject):
             Scene.drawColorBufferToScreen(colorBuffers[max(0, min(self._debugPassId[1], len(colorBuffers) - 1))], viewport)
         glEnable(GL_DEPTH_TEST)
 
+    def _packUniformBlocks(self, seconds: float, beats: float, uniforms: dict[str, Any]) -> dict[int, tuple[UniformBlockBuffer, int]]:
+        """
+        Upload the uniform blocks of the passes that will draw, see uniformblock.py.
+        Every buffer is uploaded once, with a copy of the block for each render target size.
+        Returns the buffer and copy to bind per pass index.
+        """
+        result: dict[int, tuple[UniformBlockBuffer, int]] = {}
+        resolutions: dict[UniformBlockBuffer, dict[tuple[int, int], int]] = {}
+        live = self._livePasses()
+        for i, passData in enumerate(self.passes):
+            if not self.__passDirtyState[i] or not live[i] or i >= len(self.shaders) or self.shaders[i] == 0:
+                continue
+            block = gShaderPool.uniforms(self.shaders[i]).block
+            if block is None:
+                continue
+            frameBuffer = self.frameBuffers[passData.targetBufferId]
+            copies = resolutions.setdefault(block, {})
+            copy = copies.setdefault((frameBuffer.width(), frameBuffer.height()), len(copies))
+            result[i] = block, copy
+
+        if not resolutions:
+            return result
+
+        uniforms['uSeconds'] = seconds
+        uniforms['uBeats'] = beats
+        for block, copies in resolutions.items():
+            values = []
+            for resolution in copies:
+                values.append(dict(uniforms, uResolution=resolution))
+            block.pack(values)
+        return result
+
     def draw(self, seconds: float, beats: float, uniforms: dict[str, Any], additionalTextureUniforms: Optional[dict[str, FilePath]] = None) -> int:
         global tick
         tick += 1
@@ -693,9 +969,14 @@ class Scene(QObject):
             glFinish()
         startT = time.time()
 
+        blockCopies = self._packUniformBlocks(seconds, beats, uniforms)
+
+        live = self._livePasses()
+        cleared: set[int] = set()
         maxActiveInputs = 0
         for i, passData in enumerate(self.passes):
-            if not self.__passDirtyState[i]:
+            if not self.__passDirtyState[i] or not live[i]:
+                # static passes that are not drawn stay dirty, so they draw once they become live
                 continue
 
             if self.passes[i].is3d:
@@ -724,49 +1005,42 @@ class Scene(QObject):
                 beforeT = time.time()
 
             self.frameBuffers[passData.targetBufferId].use()
+            if passData.targetBufferId not in cleared:
+                # clear Z before the first pass that draws into the buffer, not before the frame, as buffers may share depth textures
+                cleared.add(passData.targetBufferId)
+                glClear(GL_DEPTH_BUFFER_BIT)
 
             glUseProgram(self.shaders[i])
+            if i in blockCopies:
+                block, copy = blockCopies[i]
+                block.bind(copy)
 
             activeInputs = self._bindInputs(i, additionalTextureUniforms)
 
-            fn = (glUniform1f, glUniform2f, glUniform3f, glUniform4f)
-            for uniformName in uniforms:
-                if isinstance(uniforms[uniformName], int):
+            programUniforms = gShaderPool.uniforms(self.shaders[i])
+            for uniformName, value in uniforms.items():
+                if isinstance(value, int):
+                    if programUniforms.get(uniformName) is None:
+                        # not used by this pass
+                        continue
                     glActiveTexture(GL_TEXTURE0 + activeInputs)
-                    glBindTexture(GL_TEXTURE_2D, uniforms[uniformName])
-                    glUniform1i(glGetUniformLocation(self.shaders[i], uniformName), activeInputs)
+                    glBindTexture(GL_TEXTURE_2D, value)
+                    programUniforms.setInt(uniformName, activeInputs)
                     activeInputs += 1
-                elif isinstance(uniforms[uniformName], float):
-                    fn[0](glGetUniformLocation(self.shaders[i], uniformName), uniforms[uniformName])
-                elif len(uniforms[uniformName]) == 9:
-                    glUniformMatrix3fv(glGetUniformLocation(self.shaders[i], uniformName), 1, False,
-                                       (ctypes.c_float * 9)(*uniforms[uniformName]))
-                elif len(uniforms[uniformName]) == 16:
-                    glUniformMatrix4fv(glGetUniformLocation(self.shaders[i], uniformName), 1, False,
-                                       (ctypes.c_float * 16)(*uniforms[uniformName]))
-                elif len(uniforms[uniformName]) in (1, 2, 3, 4):
-                    fn[len(uniforms[uniformName]) - 1](glGetUniformLocation(self.shaders[i], uniformName), *uniforms[uniformName])
                 else:
-                    # has to be a c-type array
-                    typeName = type(uniforms[uniformName]).__name__
-                    if typeName.startswith('c_float') or typeName.startswith('c_double'):
-                        glUniform1fv(glGetUniformLocation(self.shaders[i], uniformName), len(uniforms[uniformName]), uniforms[uniformName])
-                    elif typeName.startswith('c_u'):
-                        glUniform1uiv(glGetUniformLocation(self.shaders[i], uniformName), len(uniforms[uniformName]), uniforms[uniformName])
-                    else:
-                        glUniform1iv(glGetUniformLocation(self.shaders[i], uniformName), len(uniforms[uniformName]), uniforms[uniformName])
+                    programUniforms.set(uniformName, value)
 
-            for uniformName in passData.uniforms:
-                if isinstance(passData.uniforms[uniformName], float):
-                    fn[0](glGetUniformLocation(self.shaders[i], uniformName), passData.uniforms[uniformName])
-                else:
-                    fn[len(passData.uniforms[uniformName]) - 1](glGetUniformLocation(self.shaders[i], uniformName), *passData.uniforms[uniformName])
+            # these were set when the program was linked, this only costs time when passes share a program
+            for uniformName, value in passData.uniforms.items():
+                programUniforms.set(uniformName, value)
 
             maxActiveInputs = max(maxActiveInputs, activeInputs)
 
             drawCommand = self.passes[i].drawCommand
             if drawCommand is not None:
                 exec(drawCommand)
+                # the command may have set uniforms itself
+                programUniforms.forget()
             else:
                 FullScreenRectSingleton.instance().draw()
 
@@ -10,7 +10,7 @@ from send2trash import send2trash
 import icons
 from fileutil import FilePath
 from multiplatformutil import openFileWithDefaultApplication, selectInFileBrowser
-from projutil import currentScenesDirectory, iterSceneNames, iterTemplateNames, SCENE_EXT, sectionPathsFromScene, sharedPathsFromTemplate, templateFileFromName, templateFolderFromName
+from projutil import currentScenesDirectory, iterSceneNames, iterTemplateNames, projectIndex, SCENE_EXT, sectionPathsFromScene, sharedPathsFromTemplate, templateFileFromName, templateFolderFromName
 from qt import *
 from qtutil import hlayout, vlayout
 from xmlutil import parseXMLWithIncludes
@@ -155,6 +155,9 @@ class SceneList(QWidget):
             sceneFile = sceneDir + SCENE_EXT
             send2trash(sceneFile)
             send2trash(sceneDir)
+        index = projectIndex()
+        if index is not None:
+            index.update(currentScenesDirectory())
         rows.sort()
         for row in rows[::-1]:
             self.view.model().removeRow(row)
@@ -210,6 +213,9 @@ class SceneList(QWidget):
                 with outDir.join(xElement.attrib['path']).edit() as fh:
                     fh.write(text)
 
+        index = projectIndex()
+        if index is not None:
+            index.update(scenesPath)
         self.appendSceneItem(name[0])
 
     def initShared(self) -> None:
@@ -201,8 +201,7 @@ class SceneView(QOpenGLWindow):
                     height)
 
         if self._scene:
-            uniforms = self._animator.evaluate(self._timer.time)
-            textureUniforms = self._animator.additionalTextures(self._timer.time)
+            _, uniforms, textureUniforms = self._animator.evaluateFrame(self._timer.time)
 
             modifier = currentProjectDirectory().join('animationprocessor.py')
             if modifier.exists():
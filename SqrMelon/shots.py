@@ -1,18 +1,37 @@
 from __future__ import annotations
 
-from typing import Any, Iterable, Optional, Union
+import functools
+import hashlib
+import multiprocessing
+import os
+import warnings
+import xml.parsers.expat
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Any, Iterable, Optional, Sequence, Union
 from xml.etree import cElementTree
 
 import icons
-from animationgraph.curvedata import Curve, Key
+from animationgraph.curvedata import Curve, CurveCursor, Key
 from fileutil import FilePath
-from projutil import currentProjectFilePath, currentScenesDirectory, currentTemplatesDirectory, iterSceneNames, SCENE_EXT
+from parsecache import cachedParse, CacheEntry, xmlDigest
+from projutil import currentProjectAttributes, currentProjectFilePath, currentScenesDirectory, currentTemplatesDirectory, gSettings, iterSceneNames, SCENE_EXT
 from qt import *
 from qtutil import DoubleSpinBox, hlayout, vlayout
-from scene import Scene
+from scene import deserializePassesWithEntry, PassData, preloadPasses, Scene
 from textures import TextureManager
 from util import randomColor
-from xmlutil import parseXMLWithIncludes, toPrettyXml
+from xmlutil import INCLUDE_PATTERN, parseXMLWithIncludes, toPrettyXml, writePrettyXml, xmlFixSlashesRecursively
+
+try:
+    import numpy
+except ImportError:
+    # numpy is an optional dependency (see setup.py extras), without it channels are parsed value by value
+    numpy = None  # type: ignore
+
+# Projects with fewer scenes are loaded without worker processes, as starting the processes costs more than it saves.
+PARALLEL_LOAD_MIN_SCENES = 8
 
 
 def readChannelTemplates() -> dict[str, dict[str, Curve]]:
@@ -44,25 +63,181 @@ def readChannelTemplates() -> dict[str, dict[str, Curve]]:
     return result
 
 
+class CurveDict(dict):
+    """Channel name to curve dictionary that counts changes to its layout, so cached evaluation plans know when to rebuild."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super(CurveDict, self).__init__(*args, **kwargs)
+        self.version = 0
+
+    def __setitem__(self, name: str, curve: Curve) -> None:
+        super(CurveDict, self).__setitem__(name, curve)
+        self.version += 1
+
+    def __delitem__(self, name: str) -> None:
+        super(CurveDict, self).__delitem__(name)
+        self.version += 1
+
+    def pop(self, *args: Any) -> Any:
+        self.version += 1
+        return super(CurveDict, self).pop(*args)
+
+    def popitem(self) -> tuple[str, Curve]:
+        self.version += 1
+        return super(CurveDict, self).popitem()
+
+    def setdefault(self, name: str, curve: Optional[Curve] = None) -> Curve:  # type: ignore
+        self.version += 1
+        return super(CurveDict, self).setdefault(name, curve)  # type: ignore
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super(CurveDict, self).update(*args, **kwargs)
+        self.version += 1
+
+    def clear(self) -> None:
+        super(CurveDict, self).clear()
+        self.version += 1
+
+
+class ShotEvaluationPlan:
+    """
+    Channels of a shot compiled into uniform slots.
+
+    Channels named 'uniform.x' to 'uniform.w' are grouped into vector uniforms, others are float uniforms.
+    evaluate() writes every channel into a persistent uniforms dict, of which the vector values are persistent lists,
+    so evaluating a frame allocates no containers.
+    Each channel is evaluated through a CurveCursor, so playing back costs the same regardless of the number of keys.
+    """
+
+    def __init__(self, curves: CurveDict) -> None:
+        self.version = curves.version
+        # Gather channels as either single channel floats or named multi channel dicts
+        layout: dict[str, Union[Curve, dict[str, Curve]]] = {}
+        for name in curves:
+            if '.' in name:
+                name, channel = name.split('.', 1)
+                v = layout.setdefault(name, {})
+                assert isinstance(v, dict)
+                v[channel] = curves[name + '.' + channel]
+            else:
+                assert name not in layout
+                layout[name] = curves[name]
+
+        self.uniforms: dict[str, Union[float, list[float]]] = {}
+        # persistent value lists of the vector uniforms
+        self.__vectors: list[tuple[str, list[float]]] = []
+        # (cursor, container, key) per channel, container[key] receives the channel value
+        self.__channels: list[tuple[CurveCursor, Union[dict[str, Any], list[float]], Union[str, int]]] = []
+        # uniform name to (index of its first channel, number of channels)
+        self.slots: dict[str, tuple[int, int]] = {}
+        for name, v in layout.items():
+            self.slots[name] = len(self.__channels), 1 if isinstance(v, Curve) else len(v)
+            if isinstance(v, Curve):
+                self.uniforms[name] = 0.0
+                self.__channels.append((CurveCursor(v), self.uniforms, name))
+                continue
+            for components in ('x', 'xy', 'xyz', 'xyzw'):
+                if set(v.keys()) == set(components):
+                    break
+            else:
+                assert False, 'Channels of %s must be x, xy, xyz or xyzw, got %s' % (name, ''.join(sorted(v.keys())))
+            values = [0.0] * len(components)
+            self.uniforms[name] = values
+            self.__vectors.append((name, values))
+            for index, channel in enumerate(components):
+                self.__channels.append((CurveCursor(v[channel]), values, index))
+        self.__names = frozenset(self.uniforms)
+
+    def evaluate(self, time: float, lutTolerance: float = 0.0) -> dict[str, Union[float, list[float]]]:
+        """Evaluate all channels at the given (shot local) time.
+
+        With a lutTolerance > 0 curves are evaluated from lookup tables accurate to that tolerance, see Curve.evaluateSampled().
+
+        Returns the persistent uniforms dict, so the result is only valid until the next call.
+        Entries added to it by the caller are removed on the next call.
+        """
+        uniforms = self.uniforms
+        if len(uniforms) != len(self.__names):
+            for name in uniforms.keys() - self.__names:
+                del uniforms[name]
+        # callers may also have replaced our own entries
+        for name, values in self.__vectors:
+            uniforms[name] = values
+        for cursor, container, key in self.__channels:
+            container[key] = cursor.evaluate(time, lutTolerance)  # type: ignore
+        return uniforms
+
+
 class Shot:
+    """
+    A time range of a scene with the curves and textures to animate it.
+
+    Shots are plain records, a ShotTableModel presents them as a table and is told when the shot changes,
+    so reading a shot never touches Qt.
+    """
+    __slots__ = ('__name', '__sceneName', '__start', '__end', '__speed', '__preroll', '__curves', '__plan', '_enabled', '_pinned', '__textures', 'color', '_model',
+                 '__modified', '__saved', '__source', '__origin')
+
     def __init__(self, name: str, sceneName: str, start: float = 0.0, end: float = 1.0,
                  curves: Optional[dict[str, Curve]] = None,
                  textures: Optional[dict[str, FilePath]] = None,
-                 speed: float = 1.0, preroll: float = 0.0) -> None:
-        self.items = [QStandardItem(name),
-                      QStandardItem(sceneName),
-                      QStandardItem(str(start)),
-                      QStandardItem(str(end)),
-                      QStandardItem(str(end - start)),
-                      QStandardItem(str(speed)),
-                      QStandardItem(str(preroll))]
+                 speed: float = 1.0, preroll: float = 0.0, source: Optional[ShotSource] = None) -> None:
+        """
+        When given a source, curves and textures are ignored and read from the source when they are first used instead.
+        """
+        self.__name = str(name)
+        self.__sceneName = str(sceneName)
+        self.__start = float(start)
+        self.__end = float(end)
+        self.__speed = float(speed)
+        self.__preroll = float(preroll)
+        self.__source: Optional[ShotSource] = None
         self.curves = curves or {}
+        self.__plan: Optional[ShotEvaluationPlan] = None
         self.textures = textures or {}
+        self.__source = source
+        # where the curves were read from while they are as the scene file has them, see sourceKey()
+        self.__origin = source
         self.color = QColor.fromRgb(*randomColor())
-        self.items[0].setData(self, Qt.ItemDataRole.UserRole + 1)
         self._enabled = True
         self._pinned = False
-        self.items[0].setIcon(icons.get('Checked Checkbox-48'))
+        # model presenting this shot, if any
+        self._model: Optional[ShotTableModel] = None
+        # whether values the scene file stores were set since markSaved(),
+        # with what markSaved() saw of the curves and textures, which are edited without the shot knowing
+        self.__modified = True
+        self.__saved: Optional[tuple[CurveDict, int, list[tuple[Curve, int]], dict[str, FilePath]]] = None
+
+    def __changed(self, modified: bool = True) -> None:
+        if modified:
+            self.__modified = True
+        if self._model is not None:
+            self._model.shotChanged(self)
+
+    def markSaved(self) -> None:
+        """Called when this shot was loaded from or saved to its scene file."""
+        self.__modified = False
+        if self.__source is None:
+            # saving moved the shot in the file
+            self.__origin = None
+            self.__recordSaved()
+
+    def __recordSaved(self) -> None:
+        self.__saved = self.__curves, self.__curves.version, [(curve, curve.version) for curve in self.__curves.values()], dict(self.__textures)
+
+    def isModified(self) -> bool:
+        """Whether this shot differs from its scene file, new shots are always modified."""
+        if self.__modified:
+            return True
+        if self.__source is not None:
+            # curves and textures that were never read can not have changed
+            return False
+        if self.__saved is None:
+            return True
+        curves, layoutVersion, curveVersions, textures = self.__saved
+        if curves is not self.__curves or layoutVersion != curves.version or textures != self.__textures:
+            return True
+        return any(curve.version != version for curve, version in curveVersions)
 
     @property
     def enabled(self) -> bool:
@@ -70,12 +245,13 @@ class Shot:
 
     @enabled.setter
     def enabled(self, value: bool) -> None:
+        if value == self._enabled:
+            # enabling or disabling a shot always unpins it
+            self.pinned = False
+            return
         self._enabled = value
-        self.pinned = False
-        if not value:
-            self.items[0].setIcon(icons.get('Unchecked Checkbox-48'))
-        else:
-            self.items[0].setIcon(icons.get('Checked Checkbox-48'))
+        self._pinned = False
+        self.__changed()
 
     @property
     def pinned(self) -> bool:
@@ -83,50 +259,97 @@ class Shot:
 
     @pinned.setter
     def pinned(self, value: bool) -> None:
+        if value == self._pinned:
+            return
+        # pinning is not saved, but enabling the shot to pin it is
+        modified = value and not self._enabled
         if value:
-            self.enabled = True
+            self._enabled = True
         self._pinned = value
-        if value:
-            self.items[0].setIcon(icons.get('Pin-48'))
-        else:
-            if not self._enabled:
-                self.items[0].setIcon(icons.get('Unchecked Checkbox-48'))
-            else:
-                self.items[0].setIcon(icons.get('Checked Checkbox-48'))
+        self.__changed(modified)
+
+    def __materialize(self) -> None:
+        """Read the curves and textures from the source, see __init__()."""
+        source = self.__source
+        assert source is not None
+        curveColumns, texturePaths = source.load()
+        self.__source = None
+        if xmlDigest(source.sceneFile) != source.digest:
+            # not what sourceKey() would say it is
+            self.__origin = None
+        self.__curves = CurveDict(_curvesFromColumns(curveColumns))
+        self.__textures = {textureName: FilePath(path) for textureName, path in texturePaths}
+        self.__recordSaved()
 
-    def evaluate(self, time: float) -> dict[str, Union[float, list[float]]]:
-        time -= self.start
-        time *= self.speed
-        time -= self.preroll
-        data: dict[str, Union[float, dict[str, float], list[float]]] = {}
-        # Gather values as either single channel floats or named multi channel dicts
-        for name in self.curves:
-            value = self.curves[name].evaluate(time).y
-            if '.' in name:
-                name, channel = name.split('.', 1)
-                v = data.setdefault(name, {})
-                assert isinstance(v, dict)
-                v[channel] = value
-            else:
-                assert name not in data
-                data[name] = value
-        # Convert dict values to list values
-        for name in data:
-            v = data[name]
-            if isinstance(v, dict):
-                if 'w' in v:
-                    assert set(v.keys()) == set('xyzw')
-                    data[name] = [v['x'], v['y'], v['z'], v['w']]
-                elif 'z' in v:
-                    assert set(v.keys()) == set('xyz')
-                    data[name] = [v['x'], v['y'], v['z']]
-                elif 'y' in v:
-                    assert set(v.keys()) == set('xy')
-                    data[name] = [v['x'], v['y']]
-                else:
-                    assert set(v.keys()) == set('x')
-                    data[name] = [v['x']]
-        return data  # type: ignore
+    @property
+    def curves(self) -> CurveDict:
+        if self.__source is not None:
+            self.__materialize()
+        return self.__curves
+
+    @curves.setter
+    def curves(self, curves: dict[str, Curve]) -> None:
+        if self.__source is not None:
+            self.__materialize()
+        self.__curves = curves if isinstance(curves, CurveDict) else CurveDict(curves)
+
+    @property
+    def textures(self) -> dict[str, FilePath]:
+        if self.__source is not None:
+            self.__materialize()
+        return self.__textures
+
+    @textures.setter
+    def textures(self, textures: dict[str, FilePath]) -> None:
+        if self.__source is not None:
+            self.__materialize()
+        self.__textures = textures
+
+    def channelNames(self) -> list[str]:
+        """Names of the curves, without reading the curves from the source."""
+        if self.__source is not None:
+            return list(self.__source.channels)
+        return list(self.__curves)
+
+    def sourceKey(self) -> Optional[str]:
+        """
+        Identifies the curves by the part of the scene file they were read from, None if they were edited since or were not read from a file.
+        Equal keys mean equal curves, without reading the curves from the source.
+        """
+        origin = self.__origin
+        if origin is None:
+            return None
+        if self.__source is None:
+            assert self.__saved is not None
+            curves, layoutVersion, curveVersions, _ = self.__saved
+            if curves is not self.__curves or layoutVersion != curves.version or any(curve.version != version for curve, version in curveVersions):
+                return None
+        return '%s:%d:%d' % (origin.digest, origin.begin, origin.end)
+
+    def evaluationPlan(self) -> ShotEvaluationPlan:
+        """The compiled channel layout, rebuilt when channels were added, removed or replaced."""
+        curves = self.curves
+        if self.__plan is None or self.__plan.version != curves.version:
+            self.__plan = ShotEvaluationPlan(curves)
+        return self.__plan
+
+    def localTime(self, time: float) -> float:
+        time -= self.__start
+        time *= self.__speed
+        time -= self.__preroll
+        return time
+
+    def evaluate(self, time: float, lutTolerance: float = 0.0) -> dict[str, Union[float, list[float]]]:
+        """
+        Evaluate all channels, see ShotEvaluationPlan.evaluate().
+        Returns a new dict that the caller owns, use evaluateInPlace() when the result is not kept.
+        """
+        uniforms = self.evaluateInPlace(time, lutTolerance)
+        return {name: value if isinstance(value, float) else list(value) for name, value in uniforms.items()}
+
+    def evaluateInPlace(self, time: float, lutTolerance: float = 0.0) -> dict[str, Union[float, list[float]]]:
+        """Evaluate all channels into the persistent dict of the evaluation plan, valid until the shot is evaluated again."""
+        return self.evaluationPlan().evaluate(self.localTime(time), lutTolerance)
 
     def bake(self) -> None:
         speed = self.speed
@@ -153,69 +376,72 @@ class Shot:
 
     @property
     def name(self) -> str:
-        return self.items[0].text()
+        return self.__name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        if value == self.__name:
+            return
+        self.__name = value
+        self.__changed()
 
     @property
     def sceneName(self) -> str:
-        return self.items[1].text()
+        return self.__sceneName
 
     @property
     def start(self) -> float:
-        return float(self.items[2].text())
+        return self.__start
 
     @start.setter
     def start(self, value: float) -> None:
-        strVal = str(value)
-        if strVal == self.items[2].text():
+        """Moves the shot, keeping its duration."""
+        if value == self.__start:
             return
-        self.items[2].setText(strVal)
-        self.end = value + self.duration
+        self.__end = value + self.duration
+        self.__start = value
+        self.__changed()
 
     @property
     def end(self) -> float:
-        return float(self.items[3].text())
+        return self.__end
 
     @end.setter
     def end(self, value: float) -> None:
-        strVal = str(value)
-        if strVal == self.items[3].text():
+        if value == self.__end:
             return
-        self.items[3].setText(strVal)
-        self.duration = value - self.start
+        self.__end = value
+        self.__changed()
 
     @property
     def duration(self) -> float:
-        return float(self.items[4].text())
+        return self.__end - self.__start
 
     @duration.setter
     def duration(self, value: float) -> None:
-        strVal = str(value)
-        if strVal == self.items[4].text():
-            return
-        self.items[4].setText(strVal)
-        self.end = value + self.start
+        self.end = value + self.__start
 
     @property
     def speed(self) -> float:
-        return float(self.items[5].text())
+        return self.__speed
 
     @speed.setter
     def speed(self, value: float) -> None:
-        strVal = str(value)
-        if strVal == self.items[5].text():
+        if value == self.__speed:
             return
-        self.items[5].setText(strVal)
+        self.__speed = value
+        self.__changed()
 
     @property
     def preroll(self) -> float:
-        return float(self.items[6].text())
+        return self.__preroll
 
     @preroll.setter
     def preroll(self, value: float) -> None:
-        strVal = str(value)
-        if strVal == self.items[6].text():
+        if value == self.__preroll:
             return
-        self.items[6].setText(strVal)
+        self.__preroll = value
+        self.__changed()
 
 
 class FloatItemDelegate(QItemDelegate):
@@ -224,10 +450,10 @@ class FloatItemDelegate(QItemDelegate):
         self.__editor = DoubleSpinBox()
 
     def setEditorData(self, editorWidget: DoubleSpinBox, index: QModelIndex) -> None:  # type: ignore
-        editorWidget.setValue(float(index.data()))
+        editorWidget.setValue(index.data(Qt.ItemDataRole.EditRole))
 
     def setModelData(self, editorWidget: DoubleSpinBox, model: QAbstractItemModel, index: QModelIndex) -> None:  # type: ignore
-        model.setData(index, str(editorWidget.value()))
+        model.setData(index, editorWidget.value())
 
     def createEditor(self, parentWidget: QWidget, styleOption: QStyleOption, index: QModelIndex) -> DoubleSpinBox:  # type: ignore
         self.__editor.setParent(parentWidget)
@@ -239,65 +465,269 @@ class FloatItemDelegate(QItemDelegate):
         self.closeEditor.emit(self.__editor, QAbstractItemDelegate.EndEditHint.NoHint)
 
 
-def deserializeSceneShots(sceneName: str) -> Iterable[Shot]:
-    sceneFile = currentScenesDirectory().join(FilePath(sceneName).ensureExt(SCENE_EXT))
-    xScene = parseXMLWithIncludes(sceneFile)
+def _parseKeyText(text: str) -> Sequence[float]:
+    """The comma separated key values of a channel, parsed by numpy when available."""
+    if numpy is not None:
+        try:
+            with warnings.catch_warnings():
+                # older numpy versions warn instead of raising on malformed text
+                warnings.simplefilter('error', DeprecationWarning)
+                return numpy.fromstring(text, sep=',')  # type: ignore
+        except (ValueError, DeprecationWarning):
+            pass  # let float() report the malformed value
+    return [float(value) for value in text.split(',')]
+
+
+# Channels as curve names and Curve.keyColumns(), textures as names and paths.
+ShotPayload = tuple[list[tuple[str, list[array]]], list[tuple[str, str]]]
+# Shot as cached by deserializeSceneShots(): name, start, end, speed, preroll, enabled (None when not saved)
+# and either the payload or, when only headers were parsed, where to find it.
+ShotRecord = tuple[str, float, float, float, float, Optional[bool], Union[ShotPayload, 'ShotSource']]
+
+
+def _parseShotHeader(attrib: dict[str, str]) -> tuple[str, float, float, float, float, Optional[bool]]:
+    name = attrib['name'].replace('\\', '/')  # like xmlFixSlashesRecursively()
+    start = float(attrib['start'])
+    end = float(attrib['end'])
+    speed = float(attrib.get('speed', 1.0))  # using get for legacy file support
+    preroll = float(attrib.get('preroll', 0.0))
+    enabled = attrib['enabled'] == str(True) if 'enabled' in attrib else None
+    return name, start, end, speed, preroll, enabled
+
+
+def _parseShotPayload(xShot: cElementTree.Element) -> ShotPayload:
+    curves = []
+    textures = []
+    for xEntry in xShot:
+        if xEntry.tag.lower() == 'channel':
+            curve = Curve()
+            if xEntry.text:
+                curve.loadKeyColumns(_parseKeyText(xEntry.text))
+            curves.append((xEntry.attrib['name'], curve.keyColumns()))
 
-    for xShot in xScene:
-        name = xShot.attrib['name']
-        start = float(xShot.attrib['start'])
-        end = float(xShot.attrib['end'])
-        speed = float(xShot.attrib.get('speed', 1.0))  # using get for legacy file support
-        preroll = float(xShot.attrib.get('preroll', 0.0))
+        if xEntry.tag.lower() == 'texture':
+            textures.append((xEntry.attrib['name'], xEntry.attrib['path']))
+    return curves, textures
 
-        curves = {}
-        textures: dict[str, FilePath] = {}
-        for xEntry in xShot:
-            if xEntry.tag.lower() == 'channel':
-                curveName = xEntry.attrib['name']
-                keys: list[str] = []
-                if xEntry.text:
-                    keys = xEntry.text.split(',')
-                curve = Curve()
-                for i in range(0, len(keys), 8):
-                    args: tuple[float, float, float, float, float, float] = tuple(float(x) for x in keys[i:i + 6])  # type: ignore
-                    curve.addKeyWithTangents(*args, tangentBroken=bool(int(keys[i + 6])), tangentMode=int(keys[i + 7]))
-                curves[curveName] = curve
-
-            if xEntry.tag.lower() == 'texture':
-                textures[xEntry.attrib['name']] = FilePath(xEntry.attrib['path'])
-
-        shot = Shot(name, sceneName, start, end, curves, textures, speed, preroll)
-        if 'enabled' in xShot.attrib:
-            shot.enabled = xShot.attrib['enabled'] == str(True)
+
+def _parseSceneShots(sceneFile: FilePath, _: CacheEntry) -> list[ShotRecord]:
+    xScene = parseXMLWithIncludes(sceneFile)
+    return [_parseShotHeader(xShot.attrib) + (_parseShotPayload(xShot),) for xShot in xScene]
+
+
+class ShotSource:
+    """The byte range of a Shot element in a scene file, to parse the channels and textures of a shot from when they are first used."""
+    __slots__ = ('sceneFile', 'digest', 'index', 'name', 'start', 'begin', 'end', 'channels')
+
+    def __init__(self, sceneFile: FilePath, digest: str, index: int, name: str, start: float, begin: int, end: int, channels: tuple[str, ...]) -> None:
+        self.sceneFile = sceneFile
+        self.digest = digest
+        # position, name and start of the shot in the file, to find it again when the file changed
+        self.index = index
+        self.name = name
+        self.start = start
+        self.begin = begin
+        self.end = end
+        # names of the channels in the shot
+        self.channels = channels
+
+    def load(self) -> ShotPayload:
+        if xmlDigest(self.sceneFile) != self.digest:
+            # the file changed after the headers were read, the shot has to be found again
+            xShots = list(parseXMLWithIncludes(self.sceneFile))
+            matches = [index for index, xShot in enumerate(xShots) if _parseShotHeader(xShot.attrib)[:2] == (self.name, self.start)]
+            if not matches:
+                raise ValueError('Shot "%s" at %s is no longer in %s.' % (self.name, self.start, self.sceneFile))
+            # of shots with the same name and start, the one closest to where it was
+            return _parseShotPayload(xShots[min(matches, key=lambda index: abs(index - self.index))])
+        with self.sceneFile.readBinary() as fh:
+            fh.seek(self.begin)
+            xShot = cElementTree.fromstring(fh.read(self.end - self.begin))
+        xmlFixSlashesRecursively(xShot)
+        return _parseShotPayload(xShot)
+
+
+def _parseSceneShotHeaders(sceneFile: FilePath, entry: CacheEntry) -> list[ShotRecord]:
+    """_parseSceneShots() that skips the channels and textures of each shot, the records hold a ShotSource instead."""
+    with sceneFile.readBinary() as fh:
+        data = fh.read()
+    if INCLUDE_PATTERN.search(data.decode('utf8', 'replace')):
+        # shots could come from other files, byte ranges only work for shots in this file
+        return _parseSceneShots(sceneFile, entry)
+    digest = hashlib.sha1(data).hexdigest()  # same as xmlDigest() for files without includes
+
+    parser = xml.parsers.expat.ParserCreate()
+    headers: list[dict[str, str]] = []
+    channels: list[list[str]] = []
+    # begin and end of each shot, the end is known when the parser reports what follows the shot
+    ranges: list[list[int]] = []
+    depth = 0
+    shotEnded = False
+
+    def onEvent() -> None:
+        nonlocal shotEnded
+        if shotEnded:
+            ranges[-1][1] = parser.CurrentByteIndex
+            shotEnded = False
+
+    def onStartElement(tag: str, attrib: dict[str, str]) -> None:
+        nonlocal depth
+        onEvent()
+        depth += 1
+        if depth == 2:
+            headers.append(attrib)
+            channels.append([])
+            ranges.append([parser.CurrentByteIndex, -1])
+        elif depth == 3 and tag.lower() == 'channel':
+            channels[-1].append(attrib['name'])
+
+    def onEndElement(_: str) -> None:
+        nonlocal depth, shotEnded
+        onEvent()
+        shotEnded = depth == 2
+        depth -= 1
+
+    parser.StartElementHandler = onStartElement
+    parser.EndElementHandler = onEndElement
+    parser.CharacterDataHandler = lambda _: onEvent()
+    parser.CommentHandler = lambda _: onEvent()
+    parser.ProcessingInstructionHandler = lambda *_: onEvent()
+    parser.Parse(data, True)
+
+    records = []
+    for index, (attrib, names, (begin, end)) in enumerate(zip(headers, channels, ranges)):
+        header = _parseShotHeader(attrib)
+        records.append(header + (ShotSource(sceneFile, digest, index, header[0], header[1], begin, end, tuple(names)),))
+    return records
+
+
+def _curvesFromColumns(curveColumns: list[tuple[str, list[array]]]) -> dict[str, Curve]:
+    curves = {}
+    for curveName, columns in curveColumns:
+        curve = Curve()
+        curve.restoreKeyColumns(columns)
+        curves[curveName] = curve
+    return curves
+
+
+def _shotsFromRecords(sceneName: str, records: list[ShotRecord]) -> Iterable[Shot]:
+    for name, start, end, speed, preroll, enabled, payload in records:
+        if isinstance(payload, ShotSource):
+            shot = Shot(name, sceneName, start, end, speed=speed, preroll=preroll, source=payload)
+        else:
+            curveColumns, texturePaths = payload
+            textures = {textureName: FilePath(path) for textureName, path in texturePaths}
+            shot = Shot(name, sceneName, start, end, _curvesFromColumns(curveColumns), textures, speed, preroll)
+        if enabled is not None:
+            shot.enabled = enabled
+        shot.markSaved()
         yield shot
 
 
-def _saveSceneShots(sceneName: FilePath, shots: Iterable[Shot]) -> None:
+def _sceneFile(sceneName: str) -> FilePath:
+    return currentScenesDirectory().join(FilePath(sceneName).ensureExt(SCENE_EXT))
+
+
+def _sceneRecords(sceneFile: FilePath, headersOnly: bool) -> list[ShotRecord]:
+    if headersOnly:
+        return cachedParse('shotheaders', sceneFile, functools.partial(_parseSceneShotHeaders, sceneFile))
+    return cachedParse('shots', sceneFile, functools.partial(_parseSceneShots, sceneFile))
+
+
+def deserializeSceneShots(sceneName: str, headersOnly: bool = False) -> Iterable[Shot]:
+    """
+    The shots in a scene file.
+    With headersOnly the channels and textures of each shot are parsed when the shot's curves or textures are first used,
+    this saves time and memory for shots that are never evaluated, edited or exported.
+    """
+    return _shotsFromRecords(sceneName, _sceneRecords(_sceneFile(sceneName), headersOnly))
+
+
+def _loadSceneRecords(sceneFile: FilePath, headersOnly: bool) -> tuple[list[ShotRecord], Union[tuple[CacheEntry, list[PassData]], str]]:
+    """Worker process side of loadSceneShots(), returns the shot records with the passes of the scene or why they could not be read."""
+    try:
+        passes: Union[tuple[CacheEntry, list[PassData]], str] = deserializePassesWithEntry(sceneFile)
+    except Exception as e:
+        # exceptions may not survive the trip to the main process
+        passes = '%s: %s' % (type(e).__name__, e)
+    return _sceneRecords(sceneFile, headersOnly), passes
+
+
+def loadSceneShots(sceneNames: list[str], parent: Optional[QWidget] = None, headersOnly: bool = False) -> Iterable[tuple[str, list[Shot]]]:
+    """
+    deserializeSceneShots() for each scene, yielded in the given order.
+
+    With enough scenes the files are parsed by a pool of worker processes while a progress dialog is shown,
+    scenes are yielded as soon as they and all scenes before them are done.
+    The worker processes also parse the passes of each scene and hand them to the scene view with preloadPasses(),
+    so opening a scene later does not parse them again.
+    """
+    if len(sceneNames) < PARALLEL_LOAD_MIN_SCENES:
+        for sceneName in sceneNames:
+            yield sceneName, list(deserializeSceneShots(sceneName, headersOnly))
+        return
+
+    progress = QProgressDialog('Loading scenes...', '', 0, len(sceneNames), parent)
+    progress.setWindowTitle('Loading project')
+    progress.setCancelButton(None)  # type: ignore
+    progress.setWindowModality(Qt.WindowModality.WindowModal)
+    progress.setMinimumDuration(500)
+    # workers read the current project from the settings file
+    gSettings.sync()
+    try:
+        # forking a process that runs Qt and GL threads is not safe, workers start fresh instead
+        with ProcessPoolExecutor(max_workers=min(len(sceneNames), os.cpu_count() or 1), mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(_loadSceneRecords, _sceneFile(sceneName), headersOnly) for sceneName in sceneNames]
+            for sceneName, future in zip(sceneNames, futures):
+                while not future.done():
+                    QApplication.processEvents(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents, 50)
+                    progress.setValue(sum(1 for other in futures if other.done()))
+                    wait([future], 0.05)
+                records, passes = future.result()
+                if isinstance(passes, str):
+                    print('Could not read the passes of %s, they are read again when the scene is opened.\n%s' % (sceneName, passes))
+                else:
+                    preloadPasses(_sceneFile(sceneName), *passes)
+                yield sceneName, list(_shotsFromRecords(sceneName, records))
+    finally:
+        progress.close()
+
+
+def _saveUserCameras(sceneNames: Iterable[str]) -> None:
+    """Save the user camera position of each given scene that is loaded, to the project's .user file."""
     projectPath = currentProjectFilePath()
     assert projectPath is not None
 
-    sceneFile = currentScenesDirectory().join(sceneName.ensureExt(SCENE_EXT))
-    xScene = parseXMLWithIncludes(sceneFile)
-
-    # save user camera position per scene
     userFile = projectPath.ensureExt('user')
     if userFile.exists():
         xUser = parseXMLWithIncludes(userFile)
     else:
         xUser = cElementTree.Element('user')
-    if sceneFile in Scene.cache:
+    xScenes = {xSub.attrib['name']: xSub for xSub in xUser if xSub.tag == 'scene'}
+    for sceneName in sceneNames:
+        sceneFile = _sceneFile(sceneName)
+        if sceneFile not in Scene.cache:
+            continue
         cameraData = Scene.cache[sceneFile].cameraData()
-        if cameraData:
-            for xSub in xUser:
-                if xSub.tag == 'scene' and xSub.attrib['name'] == sceneName:
-                    xSub.attrib['camera'] = ','.join([str(x) for x in cameraData])  # type: ignore
-                    break
-            else:
-                cElementTree.SubElement(xUser, 'scene', {'name': sceneName, 'camera': ','.join([str(x) for x in cameraData])})  # type: ignore
+        if not cameraData:
+            continue
+        camera = ','.join([str(x) for x in cameraData])  # type: ignore
+        if sceneName in xScenes:
+            xScenes[sceneName].attrib['camera'] = camera
+        else:
+            xScenes[sceneName] = cElementTree.SubElement(xUser, 'scene', {'name': sceneName, 'camera': camera})
 
-    with userFile.edit() as fh:
-        fh.write(toPrettyXml(xUser))
+    text = toPrettyXml(xUser)
+    if userFile.exists() and userFile.content() == text:
+        return
+    with userFile.editAtomic() as fh:
+        fh.write(text)
+
+
+def _saveSceneShots(sceneName: FilePath, shots: Iterable[Shot]) -> None:
+    """Replace the shots in the scene file by the given shots of that scene, other shots are ignored."""
+    sceneFile = _sceneFile(sceneName)
+    xScene = parseXMLWithIncludes(sceneFile)
 
     # remove old shots
     r = []
@@ -323,21 +753,23 @@ def _saveSceneShots(sceneName: FilePath, shots: Iterable[Shot]) -> None:
         for curveName in shot.curves:
             xChannel = cElementTree.SubElement(xShot, 'Channel', {'name': curveName, 'mode': 'hermite'})
             data = []
-            for key in shot.curves[curveName]:  # type: ignore
-                data.append(str(key.inTangent().x))
-                data.append(str(key.inTangent().y))
-                data.append(str(key.point().x))
-                data.append(str(key.point().y))
-                data.append(str(key.outTangent().x))
-                data.append(str(key.outTangent().y))
-                data.append(str(int(key.tangentBroken)))
-                data.append(str(key.tangentMode))
+            for inTangentX, inTangentY, time, value, outTangentX, outTangentY, tangentBroken, tangentMode in shot.curves[curveName].keyData():
+                data.append(str(inTangentX))
+                data.append(str(inTangentY))
+                data.append(str(time))
+                data.append(str(value))
+                data.append(str(outTangentX))
+                data.append(str(outTangentY))
+                data.append(str(int(tangentBroken)))
+                data.append(str(tangentMode))
             xChannel.text = ','.join(data)
         for texName in shot.textures:
             cElementTree.SubElement(xShot, 'Texture', {'name': texName, 'path': shot.textures[texName]})
 
-    with sceneFile.edit() as fh:
-        fh.write(toPrettyXml(xScene))
+    with sceneFile.editAtomic() as fh:
+        writePrettyXml(xScene, fh)
+    for shot in targets:
+        shot.markSaved()
 
 
 class ShotView(QTableView):
@@ -363,16 +795,17 @@ class ShotView(QTableView):
         return super().model()  # type: ignore
 
     def __onBakeShot(self) -> None:
-        item = self.model().item(self.__row)
-        item.text()
-        item.data(Qt.ItemDataRole.UserRole + 1).bake()
+        shot = self.model().shot(self.__row)
+        assert shot is not None
+        shot.bake()
 
     def __onManageTextures(self) -> None:
-        item = self.model().item(self.__row)
-        TextureManager(item.data(Qt.ItemDataRole.UserRole + 1)).exec_()
+        TextureManager(self.model().shot(self.__row)).exec_()
 
     def __onSelectScene(self) -> None:
-        self.findSceneRequest.emit(str(self.model().item(self.__row, 1).text()))
+        shot = self.model().shot(self.__row)
+        assert shot is not None
+        self.findSceneRequest.emit(shot.sceneName)
 
     def contextMenuEvent(self, event: QContextMenuEvent) -> None:
         self.__row = self.rowAt(event.y())
@@ -380,69 +813,316 @@ class ShotView(QTableView):
             self.__menu.popup(self.mapToGlobal(event.pos()))
 
     def __onViewShot(self) -> None:
-        self.viewShotAction.emit(float(self.model().item(self.__row, 2).text()),
-                                 float(self.model().item(self.__row, 3).text()),
-                                 self.model().item(self.__row).data(Qt.ItemDataRole.UserRole + 1))
+        shot = self.model().shot(self.__row)
+        assert shot is not None
+        self.viewShotAction.emit(shot.start, shot.end, shot)
 
     def onPinShot(self, row: Optional[int] = None) -> None:
-        item = self.model().item(self.__row if row is None else row)
-        if not item:
+        shot = self.model().shot(self.__row if row is None else row)
+        if shot is None:
             return
-        self.shotsEnabled.emit([item.data(Qt.ItemDataRole.UserRole + 1)])
-        self.pinShotAction.emit(item.data(Qt.ItemDataRole.UserRole + 1))
+        self.shotsEnabled.emit([shot])
+        self.pinShotAction.emit(shot)
+
+    def __selectedShots(self) -> list[Shot]:
+        return [self.model().shot(index.row()) for index in self.selectionModel().selectedRows()]  # type: ignore
 
     def __onEnableShot(self) -> None:
-        shots = []
-        for index in self.selectionModel().selectedRows():
-            item = self.model().item(index.row(), 0)
-            shot = item.data(Qt.ItemDataRole.UserRole + 1)
-            shots.append(shot)
+        shots = self.__selectedShots()
+        for shot in shots:
             shot.enabled = True
         self.shotsEnabled.emit(shots)
 
     def __onDisableShot(self) -> None:
-        shots = []
-        for index in self.selectionModel().selectedRows():
-            item = self.model().item(index.row(), 0)
-            shot = item.data(Qt.ItemDataRole.UserRole + 1)
-            shots.append(shot)
+        shots = self.__selectedShots()
+        for shot in shots:
             shot.enabled = False
             shot.pinned = False
         self.shotsDisabled.emit(shots)
 
 
 class ShotModel(QSortFilterProxyModel):
-    # noinspection PyMethodOverriding
-    def lessThan(self, lhs: Union[QModelIndex, QPersistentModelIndex], rhs: Union[QModelIndex, QPersistentModelIndex]) -> bool:
-        lv = lhs.data()
-        rv = rhs.data()
-        try:
-            return float(lv) < float(rv)
-        except (ValueError, TypeError):
-            return lv < rv
+    """Sorts the shot table on the native values of the shots."""
+
+    def __init__(self) -> None:
+        super(ShotModel, self).__init__()
+        self.setSortRole(Qt.ItemDataRole.EditRole)
 
-    def setSourceModel(self, sourceModel: ShotItemModel) -> None:  # type: ignore
+    def setSourceModel(self, sourceModel: ShotTableModel) -> None:  # type: ignore
         super().setSourceModel(sourceModel)
 
-    def sourceModel(self) -> ShotItemModel:
+    def sourceModel(self) -> ShotTableModel:
         return super().sourceModel()  # type: ignore
 
-    def item(self, row: int, col: int = 0) -> QStandardItem:
-        return self.sourceModel().itemFromIndex(self.mapToSource(self.index(row, col)))
+    def shot(self, row: int) -> Optional[Shot]:
+        """Shot at the given (sorted) row, None if the row does not exist."""
+        index = self.mapToSource(self.index(row, 0))
+        if not index.isValid():
+            return None
+        return self.sourceModel().shot(index.row())
+
+
+class ShotTableModel(QAbstractTableModel):
+    """
+    Presents a list of shots as a table, one column per shot attribute.
+
+    The shots store their values natively, text is only produced for display,
+    the edit role provides and accepts the native values.
+    """
+    HEADER = ('Name', 'Scene', 'Start', 'End', 'Duration', 'Speed', 'Preroll')
+    ATTRIBUTES = ('name', 'sceneName', 'start', 'end', 'duration', 'speed', 'preroll')
+
+    def __init__(self) -> None:
+        super(ShotTableModel, self).__init__()
+        self.__shots: list[Shot] = []
+        # row of each shot, so shots that change are found without searching
+        self.__rows: dict[Shot, int] = {}
+
+    def rowCount(self, parent: Union[QModelIndex, QPersistentModelIndex] = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.__shots)
 
+    def columnCount(self, parent: Union[QModelIndex, QPersistentModelIndex] = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(ShotTableModel.HEADER)
+
+    # noinspection PyMethodOverriding
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return ShotTableModel.HEADER[section]
+        return super(ShotTableModel, self).headerData(section, orientation, role)
+
+    # noinspection PyMethodOverriding
+    def data(self, index: Union[QModelIndex, QPersistentModelIndex], role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        shot = self.__shots[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(getattr(shot, ShotTableModel.ATTRIBUTES[index.column()]))
+        if role == Qt.ItemDataRole.EditRole:
+            return getattr(shot, ShotTableModel.ATTRIBUTES[index.column()])
+        if role == Qt.ItemDataRole.DecorationRole and index.column() == 0:
+            if shot.pinned:
+                return icons.get('Pin-48')
+            if shot.enabled:
+                return icons.get('Checked Checkbox-48')
+            return icons.get('Unchecked Checkbox-48')
+        return None
 
-class ShotItemModel(QStandardItemModel):
     # noinspection PyMethodOverriding
-    def flags(self, modelIndex: Union[QModelIndex, QPersistentModelIndex]) -> Qt.ItemFlag:
-        flags = super(ShotItemModel, self).flags(modelIndex)
-        if modelIndex.column() == 1:
-            return flags & ~Qt.ItemFlag.ItemIsEditable
+    def setData(self, index: Union[QModelIndex, QPersistentModelIndex], value: Any, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole or index.column() == 1:
+            return False
+        shot = self.__shots[index.row()]
+        if index.column() == 0:
+            shot.name = str(value)
+        else:
+            try:
+                value = float(value)
+            except (ValueError, TypeError):
+                return False
+            setattr(shot, ShotTableModel.ATTRIBUTES[index.column()], value)
+        return True
+
+    # noinspection PyMethodOverriding
+    def flags(self, index: Union[QModelIndex, QPersistentModelIndex]) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        flags = Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled
+        # the scene of a shot can not be changed
+        if index.column() != 1:
+            flags |= Qt.ItemFlag.ItemIsEditable
         return flags
 
+    def shot(self, row: int) -> Shot:
+        return self.__shots[row]
+
+    def shots(self) -> list[Shot]:
+        return self.__shots
+
+    def rowOf(self, shot: Shot) -> int:
+        return self.__rows[shot]
+
+    def appendShot(self, shot: Shot) -> None:
+        row = len(self.__shots)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.__shots.append(shot)
+        self.__rows[shot] = row
+        shot._model = self
+        self.endInsertRows()
+
+    def removeRows(self, row: int, count: int, parent: Union[QModelIndex, QPersistentModelIndex] = QModelIndex()) -> bool:
+        if parent.isValid() or count <= 0 or row < 0 or row + count > len(self.__shots):
+            return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        for shot in self.__shots[row:row + count]:
+            shot._model = None
+            del self.__rows[shot]
+        del self.__shots[row:row + count]
+        for index in range(row, len(self.__shots)):
+            self.__rows[self.__shots[index]] = index
+        self.endRemoveRows()
+        return True
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        for shot in self.__shots:
+            shot._model = None
+        self.__shots = []
+        self.__rows = {}
+        self.endResetModel()
+
+    def shotChanged(self, shot: Shot) -> None:
+        """Called by shots in this model when any of their values changed."""
+        row = self.__rows[shot]
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(ShotTableModel.HEADER) - 1))
+
+
+class ShotIndex:
+    """
+    Answers ShotManager.shotAtTime() without visiting every shot.
+
+    Keeps a sorted list of shot boundaries with the shot that is active between each two boundaries, so a lookup is a bisect.
+    Like the model rows the last enabled shot wins, unless an enabled shot is pinned.
+    When shots are added, removed or changed only the boundaries of those shots and the time range they cover (before and after) are updated.
+    """
+
+    def __init__(self, model: ShotTableModel) -> None:
+        self.__model = model
+        # None when the lookup table has to be built from scratch
+        self.__bounds: Optional[list[float]] = None
+        # active shot from each boundary up to the next
+        self.__winners: list[Optional[Shot]] = []
+        # number of enabled shots that start or end at each boundary
+        self.__boundCounts: dict[float, int] = {}
+        # (start, end) of every shot as the table knows it, None for disabled shots
+        self.__ranges: dict[Shot, Optional[tuple[float, float]]] = {}
+        self.__pinned: Optional[Shot] = None
+        model.rowsInserted.connect(self.__rowsInserted)
+        model.rowsAboutToBeRemoved.connect(self.__rowsAboutToBeRemoved)
+        model.modelReset.connect(self.invalidate)
+        model.dataChanged.connect(self.__dataChanged)
+
+    def invalidate(self, *_: Any) -> None:
+        self.__bounds = None
+
+    @staticmethod
+    def __range(shot: Shot) -> Optional[tuple[float, float]]:
+        return (shot.start, shot.end) if shot.enabled else None
+
+    def __build(self) -> None:
+        self.__bounds = []
+        self.__winners = []
+        self.__boundCounts = {}
+        self.__ranges = {}
+        for shot in self.__model.shots():
+            self.__update(shot, self.__range(shot), recompute=False)
+        self.__recompute(-float('inf'), float('inf'))
+        self.__findPinned()
+
+    def __findPinned(self) -> None:
+        self.__pinned = None
+        for shot in self.__model.shots():
+            if shot in self.__ranges and shot.pinned:
+                self.__pinned = shot
+                break
+
+    def __update(self, shot: Shot, newRange: Optional[tuple[float, float]], recompute: bool = True) -> None:
+        """Move the boundaries of a shot from the range the table knows to the given range, None removes them."""
+        assert self.__bounds is not None
+        oldRange = self.__ranges.pop(shot, None)
+        if newRange is not None:
+            self.__ranges[shot] = newRange
+        if oldRange == newRange:
+            return
+
+        if oldRange is not None:
+            for bound in oldRange:
+                self.__boundCounts[bound] -= 1
+                if not self.__boundCounts[bound]:
+                    del self.__boundCounts[bound]
+                    index = bisect_left(self.__bounds, bound)
+                    del self.__bounds[index]
+                    del self.__winners[index]
+        if newRange is not None:
+            for bound in newRange:
+                if bound in self.__boundCounts:
+                    self.__boundCounts[bound] += 1
+                    continue
+                self.__boundCounts[bound] = 1
+                index = bisect_left(self.__bounds, bound)
+                self.__bounds.insert(index, bound)
+                # the new boundary splits a range, both halves start out with the shot that was active there
+                self.__winners.insert(index, self.__winners[index - 1] if index else None)
+
+        if recompute:
+            bounds = [bound for r in (oldRange, newRange) if r is not None for bound in r]
+            self.__recompute(min(bounds), max(bounds))
+
+    def __recompute(self, start: float, end: float) -> None:
+        """Find the active shot again for the boundaries from start up to and including end."""
+        assert self.__bounds is not None
+        first = bisect_left(self.__bounds, start)
+        last = bisect_right(self.__bounds, end)
+        if last <= first:
+            return
+        # shots that may be active in the range, in row order
+        candidates = []
+        for shot in self.__model.shots():
+            shotRange = self.__ranges.get(shot)
+            if shotRange is not None and shotRange[0] <= end and shotRange[1] > start:
+                candidates.append((shot, shotRange))
+        for index in range(first, last):
+            time = self.__bounds[index]
+            winner = None
+            for shot, (shotStart, shotEnd) in reversed(candidates):
+                if shotStart <= time < shotEnd:
+                    winner = shot
+                    break
+            self.__winners[index] = winner
+
+    def __rowsInserted(self, parent: QModelIndex, first: int, last: int) -> None:
+        if self.__bounds is None:
+            return
+        for row in range(first, last + 1):
+            shot = self.__model.shot(row)
+            self.__update(shot, self.__range(shot))
+        self.__findPinned()
+
+    def __rowsAboutToBeRemoved(self, parent: QModelIndex, first: int, last: int) -> None:
+        if self.__bounds is None:
+            return
+        # the model still has the rows, so take them all out of the table before the remaining shots decide who is active where they were
+        removed = [(shot, self.__ranges.pop(shot, None)) for shot in (self.__model.shot(row) for row in range(first, last + 1))]
+        for shot, shotRange in removed:
+            if shotRange is not None:
+                self.__ranges[shot] = shotRange
+                self.__update(shot, None)
+        self.__findPinned()
+
+    def __dataChanged(self, topLeft: QModelIndex, bottomRight: QModelIndex, *_: Any) -> None:
+        if self.__bounds is None:
+            return
+        for row in range(topLeft.row(), bottomRight.row() + 1):
+            shot = self.__model.shot(row)
+            self.__update(shot, self.__range(shot))
+        self.__findPinned()
+
+    def shotAtTime(self, time: float) -> Optional[Shot]:
+        if self.__bounds is None:
+            self.__build()
+        if self.__pinned is not None:
+            return self.__pinned
+        assert self.__bounds is not None
+        index = bisect_right(self.__bounds, time) - 1
+        if index < 0:
+            return None
+        return self.__winners[index]
+
 
 class ShotManager(QWidget):
     currentChanged = Signal(Shot)
     shotPinned = Signal(Shot)
+    # Emitted when shots were added, removed or any of their values changed.
+    shotChanged = Signal()
 
     def __init__(self) -> None:
         super(ShotManager, self).__init__()
@@ -481,55 +1161,37 @@ class ShotManager(QWidget):
         self.__table.setItemDelegateForColumn(2, delegate)
         self.__table.setItemDelegateForColumn(3, delegate)
         mainLayout.addWidget(self.__table)
-        self.__model = ShotItemModel()
+        self.__model = ShotTableModel()
         shots = ShotModel()
         shots.setSourceModel(self.__model)
-        self.__model.setColumnCount(7)
-        self.__model.setHorizontalHeaderLabels(['Name', 'Scene', 'Start', 'End', 'Duration', 'Speed', 'Preroll'])
+        self.__index = ShotIndex(self.__model)
+        self.__model.dataChanged.connect(self.shotChanged)
+        self.__model.rowsInserted.connect(self.shotChanged)
+        self.__model.rowsRemoved.connect(self.shotChanged)
+        self.__model.modelReset.connect(self.shotChanged)
+        # scenes that must be saved even when none of their remaining shots are modified
+        self.__scenesWithRemovedShots: set[str] = set()
+        self.__model.rowsAboutToBeRemoved.connect(self.__onRowsAboutToBeRemoved)
         self.__table.setModel(shots)
         self.__table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.__table.setSortingEnabled(True)
         self.__table.sortByColumn(2, Qt.SortOrder.AscendingOrder)
         self.__table.selectionModel().currentChanged.connect(self.__onCurrentChanged)
+        # Maximum curve error when evaluating from lookup tables, 0 evaluates the curves exactly.
+        # Set per project with the CurveLUTTolerance attribute of the project file.
+        self.__lutTolerance = 0.0
         self.__loadAllShots()
-        # Duration changes end, start changes end, end changes duration.
-        self.shotChanged.connect(self.__onPropagateShotChange)
 
     def shotView(self) -> ShotView:
         return self.__table
 
-    def __onPropagateShotChange(self, changedItem: QStandardItem) -> None:
-        col = changedItem.column()
-        if col in (2, 3, 4):
-            shot = self.__model.item(changedItem.row()).data()
-            value = float(changedItem.text())
-            if col == 2:
-                shot.end = value + shot.duration
-            elif col == 3:
-                shot.duration = value - shot.start
-            elif col == 4:
-                shot.end = shot.start + value
-
     def onPinShot(self, pinShot: Shot) -> None:
         for shot in self.shots():
             shot.pinned = shot == pinShot
         self.shotPinned.emit(pinShot)
 
-    @property
-    def shotChanged(self) -> SignalInstance:
-        return self.__model.itemChanged  # type: ignore
-
     def shotAtTime(self, time: float) -> Optional[Shot]:
-        candidate: Optional[Shot] = None
-        for row in range(self.__model.rowCount()):
-            shot = self.__model.item(row).data(Qt.ItemDataRole.UserRole + 1)
-            if not shot.enabled:
-                continue
-            if shot.pinned:
-                return shot
-            if shot.start <= time < shot.end:
-                candidate = shot
-        return candidate
+        return self.__index.shotAtTime(time)
 
     def additionalTextures(self, time: float) -> dict[str, FilePath]:
         shot = self.shotAtTime(time)
@@ -541,7 +1203,17 @@ class ShotManager(QWidget):
         shot = self.shotAtTime(time)
         if not shot:
             return {}
-        return shot.evaluate(time)
+        return shot.evaluate(time, self.__lutTolerance)
+
+    def evaluateFrame(self, time: float) -> tuple[Optional[Shot], dict[str, Union[float, list[float]]], dict[str, FilePath]]:
+        """
+        The shot at the given time with its uniforms and textures, looking up the shot only once.
+        For drawing frames, the uniforms are only valid until the shot is evaluated again, see Shot.evaluateInPlace().
+        """
+        shot = self.shotAtTime(time)
+        if not shot:
+            return None, {}, {}
+        return shot, shot.evaluateInPlace(time, self.__lutTolerance), shot.textures
 
     def projectOpened(self) -> None:
         self.__loadAllShots()
@@ -551,32 +1223,44 @@ class ShotManager(QWidget):
             self.setEnabled(False)
             return
         self.setEnabled(True)
+        self.__lutTolerance = max(0.0, float(currentProjectAttributes().get('CurveLUTTolerance', 0.0)))
         self.__model.clear()
-        # model.clear() removes the header labels
-        self.__model.setHorizontalHeaderLabels(['Name', 'Scene', 'Start', 'End', 'Duration', 'Speed', 'Preroll'])
-        for sceneName in iterSceneNames():
-            for shot in deserializeSceneShots(sceneName):
-                self.__model.appendRow(shot.items)
+        self.__scenesWithRemovedShots.clear()
+        # channels are parsed when shots are first used, most shots of a big project are never touched in a session
+        for sceneName, shots in loadSceneShots(list(iterSceneNames()), self, headersOnly=True):
+            for shot in shots:
+                self.__model.appendShot(shot)
 
         self.__table.sortByColumn(2, Qt.SortOrder.AscendingOrder)
 
     def shots(self) -> Iterable[Shot]:
-        for row in range(self.__model.rowCount()):
-            shot = self.__model.item(row).data(Qt.ItemDataRole.UserRole + 1)
-            yield shot
+        yield from self.__model.shots()
 
     def selectShot(self, shot: Shot) -> None:
-        idx = self.__table.model().mapFromSource(shot.items[0].index())
+        idx = self.__table.model().mapFromSource(self.__model.index(self.__model.rowOf(shot), 0))
         self.__table.clearSelection()
         self.__table.selectRow(idx.row())
 
     def saveAllShots(self) -> None:
-        for sceneName in iterSceneNames():
-            _saveSceneShots(sceneName, self.shots())
+        """Save the user cameras and the scenes of which shots were added, removed or modified since they were loaded or saved."""
+        sceneNames = list(iterSceneNames())
+        _saveUserCameras(sceneNames)
+        shotsPerScene: dict[str, list[Shot]] = {}
+        for shot in self.shots():
+            shotsPerScene.setdefault(shot.sceneName, []).append(shot)
+        for sceneName in sceneNames:
+            shots = shotsPerScene.get(sceneName, [])
+            if sceneName in self.__scenesWithRemovedShots or any(shot.isModified() for shot in shots):
+                _saveSceneShots(sceneName, shots)
+        self.__scenesWithRemovedShots.clear()
+
+    def __onRowsAboutToBeRemoved(self, _: QModelIndex, first: int, last: int) -> None:
+        for row in range(first, last + 1):
+            self.__scenesWithRemovedShots.add(self.__model.shot(row).sceneName)
 
     def __onCurrentChanged(self, current: QModelIndex, _: Any) -> None:
-        row = self.__table.model().mapToSource(current).row()
-        self.currentChanged.emit(self.__model.item(row).data(Qt.ItemDataRole.UserRole + 1))
+        source = self.__table.model().mapToSource(current)
+        self.currentChanged.emit(self.__model.shot(source.row()) if source.isValid() else None)
 
     def __selectedShots(self) -> Iterable[Shot]:
         rows = []
@@ -584,7 +1268,7 @@ class ShotManager(QWidget):
             row = self.__table.model().mapToSource(idx).row()
             rows.append(row)
         for row in set(rows):
-            yield self.__model.item(row).data(Qt.ItemDataRole.UserRole + 1)
+            yield self.__model.shot(row)
 
     def __shotNames(self) -> Iterable[str]:
         for shot in self.shots():
@@ -667,12 +1351,12 @@ class ShotManager(QWidget):
             curves = list(channelTemplates.values())[0]
 
         shot = Shot(name.text(), scenes.currentText(), start, start + 8.0, curves)
-        self.__model.appendRow(shot.items)
+        self.__model.appendShot(shot)
 
     def __duplicateSelectedShots(self) -> None:
         for shot in self.__selectedShots():
             clone = shot.clone()
-            self.__model.appendRow(clone.items)
+            self.__model.appendShot(clone)
 
     def __deleteShots(self, rows: list[int]) -> None:
         rows = list(set(rows))
@@ -690,6 +1374,6 @@ class ShotManager(QWidget):
     def onDeleteScene(self, sceneName: str) -> None:
         rows = []
         for row in range(self.__model.rowCount()):
-            if sceneName == str(self.__model.item(row, 1).text()):
+            if sceneName == self.__model.shot(row).sceneName:
                 rows.append(row)
         self.__deleteShots(rows)
@@ -7,11 +7,11 @@ from pythonosc import udp_client
 
 import icons
 from audio import Song
-from projutil import currentProjectDirectory, currentProjectFilePath, gSettings
+from projutil import currentProjectAttributes, currentProjectDirectory, currentProjectFilePath, gSettings
 from qt import *
 from qtutil import DoubleSpinBox, hlayout, vlayout
 from shots import Shot, ShotManager
-from xmlutil import toPrettyXml
+from xmlutil import writePrettyXml
 
 
 class OSCClient:
@@ -158,12 +158,13 @@ class Timer(QObject):
             gSettings.setValue('TimerMaxTime', self.__maxTime)
             gSettings.setValue('TimerBPS', self.__BPS)
             return
-        root = cElementTree.Element('Project')
+        # keep project settings that are not ours
+        root = cElementTree.Element('Project', currentProjectAttributes())
         root.attrib['TimerMinTime'] = str(self.__minTime)
         root.attrib['TimerMaxTime'] = str(self.__maxTime)
         root.attrib['TimerBPS'] = str(self.__BPS)
         with project.edit() as fh:
-            fh.write(toPrettyXml(root))
+            writePrettyXml(root, fh)
 
     def goToStart(self) -> None:
         self.time = self.__start
@@ -0,0 +1,151 @@
+"""
+Animated uniforms in a std140 uniform block.
+
+Templates opt in by declaring the block in their shaders, usually in a header that every pass includes:
+
+    layout(std140) uniform ShotUniforms
+    {
+        vec2 uResolution;
+        float uBeats;
+        float uSeconds;
+        vec3 uOrigin;
+        ...
+    };
+
+Uniforms in the block are not set with glUniform* calls for every pass,
+instead their values are packed into one buffer that is uploaded once per frame and bound to every pass that declares the block.
+Members may be float, vec2, vec3, vec4, mat3 or mat4, passes that do not declare the block keep using plain uniforms.
+"""
+from __future__ import annotations
+
+import ctypes
+import struct
+from typing import Any, Iterable, NamedTuple, Optional
+
+from OpenGL.GL import GL_DYNAMIC_DRAW, GL_FLOAT, GL_FLOAT_MAT3, GL_FLOAT_MAT4, GL_FLOAT_VEC2, GL_FLOAT_VEC3, GL_FLOAT_VEC4, GL_INVALID_INDEX, GL_UNIFORM_BLOCK_ACTIVE_UNIFORM_INDICES, GL_UNIFORM_BLOCK_ACTIVE_UNIFORMS, GL_UNIFORM_BLOCK_DATA_SIZE, GL_UNIFORM_BUFFER, GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT, GL_UNIFORM_MATRIX_STRIDE, GL_UNIFORM_OFFSET, GL_UNIFORM_SIZE, GL_UNIFORM_TYPE, glBindBuffer, glBindBufferRange, glBufferData, glBufferSubData, glGenBuffers, glGetActiveUniform, glGetActiveUniformBlockiv, glGetActiveUniformsiv, glGetIntegerv, glGetUniformBlockIndex, glUniformBlockBinding
+
+UNIFORM_BLOCK_NAME = 'ShotUniforms'
+UNIFORM_BLOCK_BINDING = 0
+
+# rows and columns per supported member type
+_MEMBER_SHAPES = {
+    GL_FLOAT: (1, 1),
+    GL_FLOAT_VEC2: (2, 1),
+    GL_FLOAT_VEC3: (3, 1),
+    GL_FLOAT_VEC4: (4, 1),
+    GL_FLOAT_MAT3: (3, 3),
+    GL_FLOAT_MAT4: (4, 4),
+}
+
+
+class BlockMember(NamedTuple):
+    name: str
+    offset: int
+    rows: int
+    columns: int
+    # bytes from one matrix column to the next, 0 for other types
+    matrixStride: int
+
+
+class UniformBlockLayout(NamedTuple):
+    size: int
+    members: tuple[BlockMember, ...]
+
+
+def _blockParameters(program: int, blockIndex: int, pname: int, count: int = 1) -> list[int]:
+    params = (ctypes.c_int * count)()
+    glGetActiveUniformBlockiv(program, blockIndex, pname, params)
+    return list(params)
+
+
+def _uniformParameters(program: int, indices: ctypes.Array[ctypes.c_uint], pname: int) -> list[int]:
+    params = (ctypes.c_int * len(indices))()
+    glGetActiveUniformsiv(program, len(indices), indices, pname, params)
+    return list(params)
+
+
+def uniformBlockLayout(program: int) -> Optional[UniformBlockLayout]:
+    """
+    Layout of the uniform block of a linked program, None if the program does not declare it.
+    The block is bound to UNIFORM_BLOCK_BINDING. Layouts of programs that declare the same block compare equal.
+    """
+    blockIndex = glGetUniformBlockIndex(program, UNIFORM_BLOCK_NAME)
+    if blockIndex == GL_INVALID_INDEX:
+        return None
+    glUniformBlockBinding(program, blockIndex, UNIFORM_BLOCK_BINDING)
+
+    size = _blockParameters(program, blockIndex, GL_UNIFORM_BLOCK_DATA_SIZE)[0]
+    count = _blockParameters(program, blockIndex, GL_UNIFORM_BLOCK_ACTIVE_UNIFORMS)[0]
+    indices = (ctypes.c_uint * count)(*_blockParameters(program, blockIndex, GL_UNIFORM_BLOCK_ACTIVE_UNIFORM_INDICES, count))
+    offsets = _uniformParameters(program, indices, GL_UNIFORM_OFFSET)
+    types = _uniformParameters(program, indices, GL_UNIFORM_TYPE)
+    sizes = _uniformParameters(program, indices, GL_UNIFORM_SIZE)
+    matrixStrides = _uniformParameters(program, indices, GL_UNIFORM_MATRIX_STRIDE)
+
+    members = []
+    for index, offset, uniformType, arraySize, matrixStride in zip(indices, offsets, types, sizes, matrixStrides):
+        name = glGetActiveUniform(program, index)[0]
+        if isinstance(name, bytes):
+            name = name.decode('ascii')
+        shape = _MEMBER_SHAPES.get(uniformType)
+        if shape is None or arraySize != 1:
+            print('Uniform block member %s is not a float, vector or matrix, it will not be set.' % name)
+            continue
+        members.append(BlockMember(name, offset, shape[0], shape[1], matrixStride))
+    members.sort()
+    return UniformBlockLayout(size, tuple(members))
+
+
+class UniformBlockBuffer:
+    """
+    Buffer with copies of a uniform block, one for each set of values written by pack().
+    All copies are uploaded at once, bind() makes one of them the block that programs read.
+    """
+
+    def __init__(self, layout: UniformBlockLayout) -> None:
+        self.layout = layout
+        # copies must start at a multiple of the offset alignment
+        alignment = int(glGetIntegerv(GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT))
+        self.__stride = (layout.size + alignment - 1) // alignment * alignment
+        self.__members = [(member.name, member.offset, struct.Struct('%df' % member.rows), member.rows, member.columns, member.matrixStride)
+                          for member in layout.members]
+        self.__buffer = 0
+        self.__capacity = 0
+        self.__data = (ctypes.c_ubyte * 0)()
+
+    def pack(self, copies: Iterable[dict[str, Any]]) -> None:
+        """Write the values of each dict into a copy of the block and upload them all in one call. Missing members are zero."""
+        copies = list(copies)
+        size = self.__stride * len(copies)
+        if len(self.__data) < size:
+            self.__data = (ctypes.c_ubyte * size)()
+        else:
+            ctypes.memset(self.__data, 0, size)
+
+        data = self.__data
+        for copy, values in enumerate(copies):
+            base = self.__stride * copy
+            for name, offset, packer, rows, columns, matrixStride in self.__members:
+                value = values.get(name)
+                if value is None or isinstance(value, int):
+                    # ints are textures, which can not be in a block
+                    continue
+                if isinstance(value, float):
+                    packer.pack_into(data, base + offset, value)
+                elif columns == 1:
+                    packer.pack_into(data, base + offset, *value)
+                else:
+                    for column in range(columns):
+                        packer.pack_into(data, base + offset + column * matrixStride, *value[column * rows:(column + 1) * rows])
+
+        if not self.__buffer:
+            self.__buffer = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.__buffer)
+        if self.__capacity < size:
+            glBufferData(GL_UNIFORM_BUFFER, len(data), None, GL_DYNAMIC_DRAW)
+            self.__capacity = len(data)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, size, data)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+    def bind(self, copy: int) -> None:
+        glBindBufferRange(GL_UNIFORM_BUFFER, UNIFORM_BLOCK_BINDING, self.__buffer, self.__stride * copy, self.layout.size)
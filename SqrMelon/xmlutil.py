@@ -1,9 +1,21 @@
+import copy
+import io
+import os
 import re
-import xml.dom.minidom
+from collections import OrderedDict
+from typing import TextIO, Union
 from xml.etree import cElementTree
 
 from fileutil import FilePath
 
+# <!-- #include path --> comments in xml files are replaced by the content of the file at path, relative to the including file.
+INCLUDE_PATTERN = re.compile(r'<!--[ \t]*#[ \t]*include[ \t]+(.+)[ \t]*-->')
+
+# Trees parsed by parseXMLWithIncludes() by normalized path, least recently used first,
+# with the path, modification time and size of the file and its includes when they were parsed.
+_parsedTrees: OrderedDict[str, tuple[list[tuple[str, int, int]], cElementTree.Element]] = OrderedDict()
+_MAX_PARSED_TREES = 64
+
 
 def xmlFixSlashesRecursively(xElement: cElementTree.Element) -> None:
     # replace backslashes in all text and values
@@ -17,14 +29,45 @@ def xmlFixSlashesRecursively(xElement: cElementTree.Element) -> None:
         xmlFixSlashesRecursively(xChild)
 
 
+def _fileStamp(path: str) -> tuple[str, int, int]:
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def _isUpToDate(stamps: list[tuple[str, int, int]]) -> bool:
+    try:
+        return all(_fileStamp(stamp[0]) == stamp for stamp in stamps)
+    except OSError:
+        return False
+
+
+def clearParsedTrees() -> None:
+    """Forget all trees cached by parseXMLWithIncludes()."""
+    _parsedTrees.clear()
+
+
 def parseXMLWithIncludes(xmlFilePath: FilePath) -> cElementTree.Element:
+    """
+    Parses an xml file, with include comments replaced by the content of the included file.
+    Trees are cached until the file or a file it includes is modified, callers get a copy which they are free to modify.
+    """
     assert isinstance(xmlFilePath, FilePath)
+    key = os.path.normcase(os.path.abspath(xmlFilePath))
+    cached = _parsedTrees.get(key)
+    if cached is not None and _isUpToDate(cached[0]):
+        _parsedTrees.move_to_end(key)
+        return copy.deepcopy(cached[1])
+
+    # stat before reading, so a write while parsing leaves a stale stamp instead of a stale tree
+    stamps = [_fileStamp(xmlFilePath)]
     text = xmlFilePath.content()
 
     subs = []
-    for result in re.finditer(r'<!--[ \t]*#[ \t]*include[ \t]+(.+)[ \t]*-->', text):
+    for result in INCLUDE_PATTERN.finditer(text):
         inline = result.group(1).strip()
-        inlineText = xmlFilePath.parent().join(inline).content()
+        inlinePath = xmlFilePath.parent().join(inline)
+        stamps.append(_fileStamp(inlinePath))
+        inlineText = inlinePath.content()
         subs.append((result.start(0), result.end(0), inlineText))
 
     for start, end, repl in reversed(subs):
@@ -32,13 +75,125 @@ def parseXMLWithIncludes(xmlFilePath: FilePath) -> cElementTree.Element:
 
     xRoot = cElementTree.fromstring(text)
     xmlFixSlashesRecursively(xRoot)
-    return xRoot
 
+    _parsedTrees[key] = stamps, xRoot
+    _parsedTrees.move_to_end(key)
+    while len(_parsedTrees) > _MAX_PARSED_TREES:
+        _parsedTrees.popitem(last=False)
+    return copy.deepcopy(xRoot)
 
-def toPrettyXml(root: cElementTree.Element) -> str:
+
+def readRootAttributes(xmlFilePath: FilePath) -> dict[str, str]:
+    """
+    The attributes of the root element as parseXMLWithIncludes() would return them,
+    reading only up to the root start tag instead of parsing the whole file.
+    """
+    parser = cElementTree.XMLPullParser(events=('start',))
+    read = ''
+    with xmlFilePath.read() as fh:
+        while True:
+            chunk = fh.read(4096)
+            read += chunk
+            parser.feed(chunk)
+            for _, xRoot in parser.read_events():
+                if INCLUDE_PATTERN.search(read, 0, read.find('<' + xRoot.tag)):
+                    # an include before the root start tag could replace it, let the full parse deal with that
+                    return dict(parseXMLWithIncludes(xmlFilePath).attrib)
+                return {key: value.replace('\\', '/') for key, value in xRoot.attrib.items()}  # like xmlFixSlashesRecursively()
+            if not chunk:
+                if not INCLUDE_PATTERN.search(read):
+                    parser.close()  # raises the parse error
+                return dict(parseXMLWithIncludes(xmlFilePath).attrib)
+
+
+class _PrettyXmlWriter:
+    """Forwards written text to a file, leaving out lines that are empty or only whitespace and the final newline."""
+
+    def __init__(self, fh: TextIO) -> None:
+        self.__fh = fh
+        # pieces of the current line
+        self.__line: list[str] = []
+        self.__first = True
+
+    def write(self, data: str) -> None:
+        if '\n' not in data and '\r' not in data:
+            self.__line.append(data)
+            return
+        lines = data.replace('\r', '\n').split('\n')
+        self.__line.append(lines[0])
+        for line in lines[1:]:
+            self.__endLine()
+            self.__line.append(line)
+
+    def __endLine(self) -> None:
+        line = ''.join(self.__line)
+        self.__line = []
+        if not line or line.isspace():
+            return
+        if not self.__first:
+            self.__fh.write('\n')
+        self.__first = False
+        self.__fh.write(line)
+
+    def close(self) -> None:
+        self.__endLine()
+
+
+def _escapeXml(data: str) -> str:
+    return data.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+
+def _writePrettyElement(writer: _PrettyXmlWriter, xElement: cElementTree.Element, indent: str) -> None:
+    """Writes an element the way xml.dom.minidom's toprettyxml() does."""
+    if xElement.tag is cElementTree.Comment:
+        writer.write('%s<!--%s-->\n' % (indent, xElement.text or ''))
+        return
+
+    writer.write(indent + '<' + xElement.tag)
+    for name, value in xElement.attrib.items():
+        writer.write(' %s="%s"' % (name, _escapeXml(value)))
+
+    # child nodes as minidom sees them, text and tails become text nodes
+    nodes: list[Union[str, cElementTree.Element]] = []
+    if xElement.text:
+        nodes.append(xElement.text)
+    for xChild in xElement:
+        nodes.append(xChild)
+        if xChild.tail:
+            nodes.append(xChild.tail)
+
+    if not nodes:
+        writer.write('/>\n')
+        return
+    writer.write('>')
+    if len(nodes) == 1 and isinstance(nodes[0], str):
+        writer.write(_escapeXml(nodes[0]))
+    else:
+        writer.write('\n')
+        childIndent = indent + '\t'
+        for node in nodes:
+            if isinstance(node, str):
+                writer.write(childIndent + _escapeXml(node) + '\n')
+            else:
+                _writePrettyElement(writer, node, childIndent)
+        writer.write(indent)
+    writer.write('</%s>\n' % xElement.tag)
+
+
+def writePrettyXml(root: cElementTree.Element, fh: TextIO) -> None:
+    """
+    Writes toPrettyXml(root) to the file handle as it goes, instead of building the document in memory.
+    The output is that of serializing with cElementTree, pretty printing with xml.dom.minidom and removing blank lines.
+    """
     root.text = None
     xmlFixSlashesRecursively(root)
-    text: str = cElementTree.tostring(root)  # type: ignore
-    text = xml.dom.minidom.parseString(text).toprettyxml()
-    text = text.replace('\r', '\n')
-    return '\n'.join(line for line in text.split('\n') if line and line.strip())
+    writer = _PrettyXmlWriter(fh)
+    writer.write('<?xml version="1.0" ?>\n')
+    _writePrettyElement(writer, root, '')
+    writer.close()
+
+
+def toPrettyXml(root: cElementTree.Element) -> str:
+    fh = io.StringIO()
+    writePrettyXml(root, fh)
+    return fh.getvalue()